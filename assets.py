@@ -0,0 +1,68 @@
+import re
+from functools import lru_cache
+
+# ---------------------------------------------------------------------------
+#  STATIC ASSETS  (built once per process, not on every script run)
+# ---------------------------------------------------------------------------
+LOGO_URL = "https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png"
+SPACER_HTML = "<div style='height:12px'></div>"
+
+_STYLE_SOURCE = """
+<style>
+body{background:linear-gradient(135deg,#2fe273 0%,#09742a 100%)!important;min-height:100vh;}
+.stApp{
+  background:linear-gradient(335deg,#2fe273 0%,#09742a 100%)!important;
+  border-radius:32px;
+  max-width:400px;
+  min-height:730px;
+  margin:32px auto;
+  box-shadow:0 8px 32px rgba(60,60,60,.25),0 1.5px 8px rgba(30,90,40,.06);
+  border:3px solid #ffffff;
+  display:flex;
+  flex-direction:column;
+  align-items:center;
+  padding:10px 10px 10px;
+}
+.biglabel{font-size:1.4em;font-weight:800;color:#ffffff;margin:4px 0 10px;text-align:center;letter-spacing:.5px;}
+.frame-avatar{font-size:1.4em;margin:6px 0 6px;display:flex;justify-content:center;color:#ffffff;}
+
+.stButton>button{
+  border-radius:26px!important;
+  font-weight:700!important;
+  font-size:.9em!important;
+  padding:.8em 0!important;
+  background:#27e67a!important;
+  color:#ffffff!important;
+  margin:6px 0!important;
+  width:100%!important;
+}
+.top-nav-container {
+  padding: 12px 12px 12px 12px !important;
+  border-radius: 32px !important;
+  margin: -10px -10px 24px -10px !important;
+  width: calc(100% + 20px) !important;
+}
+
+/* --- Top nav button colors: HIGH SPECIFICITY! --- */
+.top-nav-container > div[data-testid="stHorizontalBlock"] > div > div[data-testid="stButton"][data-key="nav_home"] > button { background: #e63946 !important; }
+.top-nav-container > div[data-testid="stHorizontalBlock"] > div > div[data-testid="stButton"][data-key="nav_chat"] > button { background: #27e67a !important; }
+.top-nav-container > div[data-testid="stHorizontalBlock"] > div > div[data-testid="stButton"][data-key="nav_saved"] > button { background: #1d3557 !important; }
+
+/* --- Answer bubble --- */
+.answer-box{background:#23683c;border-radius:12px;padding:14px 18px;color:#fff;white-space:pre-wrap;margin-top:8px;}
+@media (max-height:750px){.stApp{min-height:640px;}}
+</style>
+"""
+
+
+def _compact(html: str) -> str:
+    """Drop the indentation and line breaks, so markdown never reads the block as code."""
+    return re.sub(r"\n\s*", "", html.strip())
+
+
+STYLE_SHEET = _compact(_STYLE_SOURCE)
+
+
+@lru_cache(maxsize=None)
+def logo_html(width: int = 80) -> str:
+    return f'<div style="text-align:center;"><img src="{LOGO_URL}" width="{width}" /></div>'
@@ -0,0 +1,205 @@
+"""Headless benchmarks for every app step, against the local fake OpenAI server.
+
+Drives mph2025_v5.py through Streamlit's AppTest harness (no browser, no API
+key) and prints one JSON object per measurement:
+
+- step_render: rerun time of steps 0-8
+- save_profile / save_response / delete_response / delete_profile: one
+  click on the corresponding button
+- send: end-to-end SEND in step 6 until the answer is attached to the
+  session, including the fake model latency
+
+Each size in --sizes seeds a fresh database with that many profiles and
+saved responses.
+
+    python bench/bench_app.py                          # sizes 10, 1000, 100000
+    python bench/bench_app.py --sizes 10 1000 --runs 10 --out bench.json
+"""
+import argparse, json, os, sqlite3, statistics, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from fake_openai import FakeOpenAI
+from storage import Shards
+
+APP = os.path.join(ROOT, "mph2025_v5.py")
+USERS_DIR = "parent_helpers_users"
+BENCH_USER = "bench-user-0001"   # every benchmark session opens the app as this user (?u=...)
+PERSONA = "Warm, boundaried coaching that names feelings and keeps routines predictable. " * 3
+
+
+def seed(size: int, user: str = BENCH_USER):
+    profiles = [{"profile_name": f"Profile {i}", "parent_name": "Sam", "child_name": "Alex",
+                 "child_age": 1 + i % 12, "source_type": "Book", "source_name": "Peaceful Parent, Happy Kids",
+                 "persona_description": PERSONA} for i in range(size)]
+    responses = [{"profile": f"Profile {i % max(1, size)}", "shortcut": "💬 DEFAULT",
+                  "question": f"Question {i}: how do I handle bedtime?",
+                  "answer": "Keep the routine steady and name the feeling. " * 4} for i in range(size)]
+    store = Shards(USERS_DIR).store(user)
+    store.migrate_json(profiles, responses)
+    store.close()
+
+
+class Bench:
+    def __init__(self, fake: FakeOpenAI, size: int, runs: int, timeout: float):
+        self.fake, self.size, self.runs, self.timeout = fake, size, runs, timeout
+        self.results = []
+        self._counter = 0
+
+    def app(self, **state) -> AppTest:
+        at = AppTest.from_file(APP, default_timeout=self.timeout)
+        at.query_params["u"] = BENCH_USER
+        at.secrets["openai_key"] = "sk-fake"
+        at.secrets["openai_base_url"] = self.fake.url
+        for key, value in state.items():
+            at.session_state[key] = value
+        return at
+
+    def unique(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix} {self._counter} {time.time_ns()}"
+
+    def record(self, bench: str, samples: list, **labels):
+        samples = sorted(samples)
+        row = {"bench": bench, "size": self.size, **labels, "runs": len(samples),
+               "mean_ms": round(1000 * statistics.fmean(samples), 2),
+               "p50_ms": round(1000 * samples[len(samples) // 2], 2),
+               "p95_ms": round(1000 * samples[min(len(samples) - 1, int(0.95 * len(samples)))], 2),
+               "max_ms": round(1000 * samples[-1], 2)}
+        self.results.append(row)
+        print(json.dumps(row, ensure_ascii=False), flush=True)
+
+    @staticmethod
+    def wait_for_jobs(at: AppTest, poll: float = 0.02) -> AppTest:
+        """Rerun until the session's background jobs are collected, as the browser's auto-refresh would."""
+        while "chat_job" in at.session_state or "persona_job" in at.session_state:
+            time.sleep(poll)
+            at.run()
+        return at
+
+    @staticmethod
+    def check(at: AppTest):
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    def timed(self, fn) -> float:
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
+
+    def first_id(self, table: str, order: str):
+        """Id of the first row on page 1 of the step's list."""
+        with sqlite3.connect(Shards(USERS_DIR).path(BENCH_USER)) as db:
+            row = db.execute(f"SELECT id FROM {table} ORDER BY id {order} LIMIT 1").fetchone()
+        return None if row is None else row[0]
+
+    # -- benchmarks ------------------------------------------------------------
+    def step_renders(self):
+        source = {"source_type": "Book", "source_name": "Peaceful Parent, Happy Kids",
+                  "persona_description": PERSONA}
+        for step in range(9):
+            state = {"step": step, **(source if step in (2, 3, 4) else {})}
+            at = self.app(**state)
+            at.run()
+            self.check(at)
+            if at.session_state["step"] != step:  # e.g. step 7 with no saved chats bounces home
+                continue
+            self.record("step_render", [self.timed(at.run) for _ in range(self.runs)], step=step)
+
+    def save_profile(self):
+        samples = []
+        for _ in range(self.runs):
+            at = self.app(step=4, source_type="Book", source_name="Montessori", persona_description=PERSONA)
+            at.run()
+            at.text_input[0].input("Sam")
+            at.text_input[1].input("Alex")
+            at.text_input[2].input(self.unique("Bench profile"))
+            samples.append(self.timed(at.button(key="FormSubmitter:profile-SAVE").click().run))
+            self.check(at)
+        self.record("save_profile", samples)
+
+    def save_response(self):
+        if not self.size:
+            return
+        samples = []
+        for _ in range(self.runs):
+            at = self.app(step=6, last_answer="Keep the routine steady.")
+            at.run()
+            at.text_area(key="chat_query").input(self.unique("Benchmark question"))
+            samples.append(self.timed(at.button(key="save_response").click().run))
+            self.check(at)
+        self.record("save_response", samples)
+
+    def send(self):
+        if not self.size:
+            return
+        samples = []
+        for _ in range(self.runs):
+            at = self.app(step=6)
+            at.run()
+            at.text_area(key="chat_query").input(self.unique("My toddler won't sleep"))
+            samples.append(self.timed(lambda: self.wait_for_jobs(at.button(key="send_btn").click().run())))
+            self.check(at)
+        self.record("send", samples, fake_latency_ms=round(1000 * self.fake.latency))
+
+    def delete(self, bench: str, table: str, order: str, step: int, select_key: str, button: str):
+        samples = []
+        for _ in range(self.runs):
+            row_id = self.first_id(table, order)
+            if row_id is None:
+                break
+            at = self.app(step=step, **{select_key: row_id})
+            at.run()
+            samples.append(self.timed(at.button(key=button).click().run))
+            self.check(at)
+        if samples:
+            self.record(bench, samples)
+
+    def run_all(self):
+        self.step_renders()
+        self.save_profile()
+        self.save_response()
+        self.send()
+        self.delete("delete_response", "responses", "DESC", 7, "saved_select", "btn_delete_saved")
+        self.delete("delete_profile", "profiles", "ASC", 8, "profile_select", "btn_delete_profile")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless per-step benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000],
+                        help="stored profiles and responses to seed (default 10 1000 100000)")
+    parser.add_argument("--runs", type=int, default=5, help="samples per measurement")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake model time-to-first-token (s)")
+    parser.add_argument("--tps", type=float, default=200.0, help="fake model tokens per second")
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest timeout per run (s)")
+    parser.add_argument("--out", help="also write all results to this JSON file")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(latency=args.latency, tokens_per_sec=args.tps).start()
+    results = []
+    try:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory() as data_dir:
+                os.chdir(data_dir)
+                st.cache_resource.clear()  # fresh store/caches for every size
+                seed(size)
+                bench = Bench(fake, size, args.runs, args.timeout)
+                bench.run_all()
+                results += bench.results
+                st.cache_resource.clear()
+                os.chdir(ROOT)
+    finally:
+        fake.stop()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "results": results},
+                      f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Local OpenAI-compatible stub for benchmarks and load tests.
+
+Serves ``POST /v1/chat/completions`` (plain, JSON-mode and streamed) with a
+configurable time-to-first-token, token rate and 429 rate, so app
+performance can be measured without an API key. Prompt caching is mimicked
+too: once a message prefix of at least 1024 tokens has been seen, later
+requests that start with it report it as ``cached_tokens``.
+
+    python bench/fake_openai.py --port 8000 --latency 0.4 --tps 60
+    # then set openai_base_url = "http://127.0.0.1:8000/v1" in secrets
+"""
+import argparse, json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CACHE_MIN_TOKENS = 1024            # like OpenAI: shorter prefixes are never cached
+CACHE_INCREMENT = 128
+
+ANSWER = ("Keep bedtime the same every night, dim the lights an hour before, and offer two "
+          "simple choices so your child feels in control while you hold the routine steady.")
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2,
+                 tokens_per_sec: float = 200.0, error_rate: float = 0.0):
+        super().__init__((host, port), Handler)
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._prefixes = set()          # hashes of message prefixes seen so far
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAI":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def cached_tokens(self, messages: list) -> int:
+        """Length of the longest previously seen message prefix, in cacheable tokens."""
+        cached, chars, seen = 0, 0, []
+        for i, message in enumerate(messages):
+            chars += len(str(message.get("content", "")))
+            key = hash(json.dumps(messages[:i + 1], sort_keys=True))
+            seen.append(key)
+            with self._lock:
+                hit = key in self._prefixes
+            if hit and chars // 4 >= CACHE_MIN_TOKENS:
+                cached = chars // 4 // CACHE_INCREMENT * CACHE_INCREMENT
+        with self._lock:
+            self._prefixes.update(seen)
+        return cached
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server: FakeOpenAI = self.server
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server._lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if random.random() < server.error_rate:
+                self._send_json(429, {"error": {"message": "rate limited (fake)", "type": "rate_limit"}},
+                                headers=[("Retry-After", "0.1")])
+                return
+            self._complete(server, request)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client cancelled the stream
+        finally:
+            with server._lock:
+                server.in_flight -= 1
+
+    def _complete(self, server: FakeOpenAI, request: dict):
+        prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+        text = ANSWER
+        if request.get("response_format", {}).get("type") == "json_object":
+            key = "persona_description" if "persona_description" in prompt else "answer"
+            text = json.dumps({key: text})
+        words = text.split(" ")
+        usage = {"prompt_tokens": max(1, len(prompt) // 4), "completion_tokens": len(words),
+                 "total_tokens": max(1, len(prompt) // 4) + len(words),
+                 "prompt_tokens_details": {"cached_tokens": server.cached_tokens(request.get("messages", []))}}
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model", "fake")}
+        time.sleep(server.latency)
+        if not request.get("stream"):
+            time.sleep(len(words) / server.tokens_per_sec)
+            self._send_json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else " " + word}
+            self._event({**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            time.sleep(1 / server.tokens_per_sec)
+        if request.get("stream_options", {}).get("include_usage"):
+            self._event({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _event(self, payload: dict):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=200.0, help="completion tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+    server = FakeOpenAI(args.host, args.port, args.latency, args.tps, args.error_rate)
+    print(f"fake OpenAI listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Concurrent-session load test for the step 6 SEND / SAVE RESPONSE path.
+
+Streamlit's AppTest harness is not thread-safe: it swaps process-global
+runtime and secrets on every run. Each simulated parent therefore runs in
+its own worker process. --concurrency N means N app processes serving one
+session each. They share the SQLite database and the local fake OpenAI
+server, but each has its own caches and its own openai_max_concurrency
+limit. These are the numbers needed to pick a Streamlit worker count and a
+per-worker upstream limit.
+
+A session goes home -> CHAT -> picks a profile -> types a question -> SEND,
+and in the ``send_save`` scenario also SAVE RESPONSE. For every
+concurrency level one JSON report is printed. It holds throughput,
+p50/p95/p99 latency per action, error rates, upstream peak concurrency and
+storage contention: store latency per op, lock waits included, taken from
+the app's NDJSON metrics log, plus any "database is locked" errors.
+
+    python bench/loadtest.py --concurrency 1 4 16 --flows 5
+    python bench/loadtest.py --scenario send --same-question --upstream-limit 4
+    python bench/loadtest.py --concurrency 8 --users 8     # one storage shard per session
+"""
+import argparse, json, multiprocessing, os, statistics, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streamlit.testing.v1 import AppTest
+
+from bench_app import BENCH_USER, Bench, seed
+from fake_openai import FakeOpenAI
+
+APP = os.path.join(ROOT, "mph2025_v5.py")
+SCENARIOS = ("send", "send_save")
+METRICS_LOG = "loadtest_metrics.ndjson"
+
+
+def bench_user(n: int) -> str:
+    return BENCH_USER if n == 0 else f"{BENCH_USER}-{n}"
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+    pick = lambda q: round(1000 * samples[min(len(samples) - 1, int(q * len(samples)))], 1)
+    return {"count": len(samples), "mean_ms": round(1000 * statistics.fmean(samples), 1),
+            "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+class Session:
+    """One simulated parent; runs inside a worker process."""
+
+    def __init__(self, args, fake_url: str, session_no: int):
+        self.args = args
+        self.fake_url = fake_url
+        self.session_no = session_no
+        self.latencies = {}
+        self.errors = {}
+        self.flows_ok = 0
+
+    def new_app(self) -> AppTest:
+        at = AppTest.from_file(APP, default_timeout=self.args.timeout)
+        at.query_params["u"] = bench_user(self.session_no % self.args.users)
+        at.secrets["openai_key"] = "sk-fake"
+        at.secrets["openai_base_url"] = self.fake_url
+        at.secrets["openai_max_concurrency"] = self.args.upstream_limit
+        at.secrets["metrics_log"] = METRICS_LOG
+        return at
+
+    def action(self, name: str, fn) -> AppTest:
+        started = time.perf_counter()
+        at = fn()
+        elapsed = time.perf_counter() - started
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].message}")
+        if at.error:
+            raise RuntimeError(f"{name}: {at.error[0].value}")
+        self.latencies.setdefault(name, []).append(elapsed)
+        return at
+
+    def flow(self, flow_no: int):
+        question = ("My toddler won't sleep" if self.args.same_question
+                    else f"My toddler won't sleep (session {self.session_no}, flow {flow_no})")
+        try:
+            at = self.action("open", self.new_app().run)
+            at = self.action("open_chat", at.button(key="home_chat").click().run)
+            profile_box = at.selectbox(key="chat_profile")
+            pick = profile_box.options[self.session_no % len(profile_box.options)]
+            at = self.action("select_profile", profile_box.select(pick).run)
+            at.text_area(key="chat_query").input(question)
+            at = self.action("send", lambda: Bench.wait_for_jobs(at.button(key="send_btn").click().run()))
+            if not at.session_state["last_answer"]:
+                raise RuntimeError("send: no answer")
+            if self.args.scenario == "send_save":
+                self.action("save_response", at.button(key="save_response").click().run)
+            self.flows_ok += 1
+        except Exception as e:
+            kind = "database_locked" if "database is locked" in str(e) else type(e).__name__
+            self.errors.setdefault(kind, []).append(str(e)[:200])
+
+
+def run_session(args, fake_url: str, data_dir: str, session_no: int, start_at: float) -> dict:
+    os.chdir(data_dir)
+    time.sleep(max(0.0, start_at - time.time()))  # start all sessions together
+    session = Session(args, fake_url, session_no)
+    for flow_no in range(args.flows):
+        session.flow(flow_no)
+    return {"latencies": session.latencies, "errors": session.errors, "flows_ok": session.flows_ok}
+
+
+def run_level(args, fake: FakeOpenAI, data_dir: str, concurrency: int) -> dict:
+    requests_before = fake.requests
+    fake.max_in_flight = 0
+    latencies, errors, flows_ok = {}, {}, 0
+    with multiprocessing.Pool(concurrency) as pool:
+        start_at = time.time() + 2.0
+        jobs = [pool.apply_async(run_session, (args, fake.url, data_dir, n, start_at)) for n in range(concurrency)]
+        results = [job.get() for job in jobs]
+    wall = time.time() - start_at
+    for result in results:
+        flows_ok += result["flows_ok"]
+        for name, samples in result["latencies"].items():
+            latencies.setdefault(name, []).extend(samples)
+        for kind, messages in result["errors"].items():
+            errors.setdefault(kind, []).extend(messages)
+    flows = concurrency * args.flows
+    return {
+        "scenario": args.scenario, "concurrency": concurrency, "flows": flows,
+        "wall_s": round(wall, 2), "throughput_flows_per_s": round(flows_ok / wall, 2),
+        "error_rate": round(sum(len(v) for v in errors.values()) / flows, 4),
+        "errors": {kind: len(v) for kind, v in errors.items()},
+        "error_samples": [messages[0] for messages in errors.values()],
+        "upstream_requests": fake.requests - requests_before,
+        "upstream_peak_in_flight": fake.max_in_flight,
+        "latency": {name: percentiles(samples) for name, samples in latencies.items()},
+        "storage": storage_contention(),
+    }
+
+
+def storage_contention() -> dict:
+    """Per-op store latency (lock wait included) from the app's metrics log."""
+    samples = {}
+    if os.path.exists(METRICS_LOG):
+        with open(METRICS_LOG, encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                if row["metric"] == "storage_seconds" and row["labels"]["op"] in ("add_response", "version"):
+                    samples.setdefault(row["labels"]["op"], []).append(row["value"])
+    return {op: percentiles(values) for op, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for SEND / SAVE RESPONSE")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="send_save")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16],
+                        help="simultaneous sessions per run (default 1 4 16)")
+    parser.add_argument("--flows", type=int, default=3, help="flows per session")
+    parser.add_argument("--profiles", type=int, default=20, help="profiles/responses seeded before the run")
+    parser.add_argument("--users", type=int, default=1,
+                        help="distinct users (storage shards) the sessions are spread over")
+    parser.add_argument("--same-question", action="store_true",
+                        help="every session asks the same question (exercises caching/coalescing)")
+    parser.add_argument("--upstream-limit", type=int, default=16, help="openai_max_concurrency for the app")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model time-to-first-token (s)")
+    parser.add_argument("--tps", type=float, default=100.0, help="fake model tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake 429 responses")
+    parser.add_argument("--timeout", type=float, default=120.0, help="AppTest timeout per action (s)")
+    parser.add_argument("--out", help="also write all reports to this JSON file")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(latency=args.latency, tokens_per_sec=args.tps, error_rate=args.error_rate).start()
+    reports = []
+    try:
+        for concurrency in args.concurrency:
+            with tempfile.TemporaryDirectory() as data_dir:
+                os.chdir(data_dir)
+                for n in range(args.users):
+                    seed(args.profiles, bench_user(n))
+                report = run_level(args, fake, data_dir, concurrency)
+                print(json.dumps(report, ensure_ascii=False), flush=True)
+                reports.append(report)
+                os.chdir(ROOT)
+    finally:
+        fake.stop()
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "reports": reports},
+                      f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
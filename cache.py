@@ -0,0 +1,169 @@
+import hashlib, json, os, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional
+
+# ---------------------------------------------------------------------------
+#  PROCESS-WIDE LRU / TTL CACHE
+# ---------------------------------------------------------------------------
+class LRUCache:
+    """Thread-safe LRU cache with an optional TTL and optional JSON persistence.
+
+    Keys must be strings when ``path`` is set so the cache can be written to disk.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        if self.path:
+            self.save()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is not None and self.path:
+            self.save()
+        return default if entry is None else entry[0]
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._expired(entry[1])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            for key, value, stored_at in entries:
+                if not self._expired(stored_at):
+                    self._data[key] = (value, stored_at)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def save(self):
+        with self._lock:
+            entries = [[k, v, t] for k, (v, t) in self._data.items()]
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # the cache is best-effort; a read-only disk must not break the app
+
+
+# ---------------------------------------------------------------------------
+#  SINGLE-FLIGHT REQUEST COALESCING
+# ---------------------------------------------------------------------------
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    The first caller (the leader) runs ``fn``; callers arriving while it is in
+    flight block and receive the leader's result or exception.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._calls: dict = {}
+        self._waiting: dict = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.followers += 1
+                self._waiting[key] = self._waiting.get(key, 0) + 1
+        if not leader:
+            try:
+                return future.result()
+            finally:
+                with self._lock:
+                    self._waiting[key] -= 1
+                    if not self._waiting[key]:
+                        del self._waiting[key]
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def waiters(self, key) -> int:
+        """Followers currently blocked on ``key``; the leader may only give up when this is 0."""
+        with self._lock:
+            return self._waiting.get(key, 0)
+
+    def stats(self) -> dict:
+        return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self._calls)}
+
+
+# ---------------------------------------------------------------------------
+#  KEY HELPERS
+# ---------------------------------------------------------------------------
+def normalize(text: str) -> str:
+    return " ".join(str(text).split()).casefold()
+
+def persona_key(source_type: str, source_name: str, version: int) -> str:
+    return f"v{version}|{normalize(source_type)}|{normalize(source_name)}"
+
+def answer_key(*parts) -> str:
+    """Hash of every piece that goes into a chat prompt, in order."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
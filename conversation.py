@@ -0,0 +1,132 @@
+from typing import Callable, Optional
+
+# ---------------------------------------------------------------------------
+#  TOKEN-BUDGETED CONVERSATION MEMORY
+# ---------------------------------------------------------------------------
+CONVERSATION_TOKEN_BUDGET = 2000    # summary + kept turns sent with every SEND
+SUMMARY_TOKEN_BUDGET = 300
+KEEP_LAST_TURNS = 2                 # never folded into the summary (but clipped if alone over budget)
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_PROMPT = (
+    "You maintain the running summary of a conversation between a parent and a parenting coach. "
+    "Merge the new turns into the summary. Keep names, ages, concerns and advice already given; "
+    "drop small talk. Reply with the updated summary only, at most 150 words."
+)
+SPEAKERS = {"user": "Parent", "assistant": "Coach"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token in English); no tokenizer dependency."""
+    return len(text) // 4 + 1
+
+
+def clip(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cut ``text`` to about ``max_tokens``, keeping its start (or its end)."""
+    max_chars = max(1, max_tokens) * 4
+    if len(text) <= max_chars:
+        return text
+    return "…" + text[-max_chars:].lstrip() if keep_end else text[:max_chars].rstrip() + "…"
+
+
+def transcript(turns: list, max_tokens_per_turn: Optional[int] = None) -> str:
+    lines = []
+    for turn in turns:
+        content = turn["content"] if max_tokens_per_turn is None else clip(turn["content"], max_tokens_per_turn)
+        lines.append(f"{SPEAKERS.get(turn['role'], turn['role'])}: {content}")
+    return "\n".join(lines)
+
+
+def llm_summarizer(llm, model: Optional[str] = SUMMARY_MODEL) -> Callable[[str, list], str]:
+    """``summarize(summary, turns)`` for ``Conversation.compact`` backed by an LLMClient/StubLLM.
+
+    Pass ``model=None`` with a routing.Router to let the routing rules pick it.
+    """
+    def summarize(summary: str, turns: list) -> str:
+        out = llm.chat(
+            call="summary",
+            **({"model": model} if model else {}),
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Summary so far:\n{summary or '(none)'}\n\nNew turns:\n{transcript(turns)}"},
+            ],
+        )
+        return out.choices[0].message.content.strip()
+    return summarize
+
+
+class Conversation:
+    """One chat thread: the full ``history`` for display and saving, and the prompt
+    window of ``turns`` sent to the model plus a running summary of older ones.
+
+    ``compact()`` folds the oldest window turns into the summary until they fit
+    ``budget`` tokens, so the prompt stays bounded however long the thread gets.
+    Each turn is summarized once, when it is evicted, and the summary itself is
+    capped at ``summary_budget`` tokens.
+    """
+
+    def __init__(self, history: Optional[list] = None, turns: Optional[list] = None, summary: str = "",
+                 folded: int = 0, budget: int = CONVERSATION_TOKEN_BUDGET,
+                 summary_budget: int = SUMMARY_TOKEN_BUDGET, keep_last: int = KEEP_LAST_TURNS):
+        self.history = list(history or [])
+        self.turns = list(self.history if turns is None else turns)
+        self.summary = summary
+        self.folded = folded            # turns already folded into the summary
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.keep_last = keep_last
+
+    def __bool__(self) -> bool:
+        return bool(self.history)
+
+    def add(self, role: str, content: str):
+        turn = {"role": role, "content": content}
+        self.history.append(turn)
+        self.turns.append(turn)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(t["content"]) for t in self.turns)
+
+    def over_budget(self) -> bool:
+        """Whether ``compact()`` has work to do (which may mean an LLM call)."""
+        return self.tokens() > self.budget
+
+    def compact(self, summarize: Optional[Callable[[str, list], str]] = None):
+        """Fold the oldest window turns into the summary until the window fits the budget.
+
+        ``summarize(summary, turns)`` condenses the evicted turns (e.g. with an
+        LLM); without it, or when it fails, they are clipped and appended.
+        """
+        evicted = []
+        while self.over_budget() and len(self.turns) > self.keep_last:
+            evicted.append(self.turns.pop(0))
+        if evicted:
+            summary = None
+            if summarize is not None:
+                try:
+                    summary = summarize(self.summary, evicted)
+                except Exception:
+                    summary = None  # memory must never fail a SEND: fall back to truncation
+            if not summary:
+                summary = f"{self.summary}\n{transcript(evicted, max_tokens_per_turn=60)}".strip()
+            self.summary = clip(summary, self.summary_budget, keep_end=True)
+            self.folded += len(evicted)
+        # The kept turns alone can still be too long (e.g. one huge answer): clip them.
+        room = max(1, self.budget - estimate_tokens(self.summary))
+        if self.turns and self.over_budget():
+            share = max(1, room // len(self.turns) - 1)  # clip() can add a token for the "…"
+            self.turns = [{**t, "content": clip(t["content"], share)} for t in self.turns]
+
+    def messages(self) -> list:
+        """The prompt window as chat messages: the running summary first, then the kept turns."""
+        out = []
+        if self.summary:
+            out.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return out + [dict(t) for t in self.turns]
+
+    def to_dict(self) -> dict:
+        return {"history": self.history, "turns": self.turns, "summary": self.summary, "folded": self.folded}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Conversation":
+        return cls(history=data.get("history"), turns=data.get("turns"),
+                   summary=data.get("summary", ""), folded=data.get("folded", 0))
@@ -0,0 +1,128 @@
+import threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# ---------------------------------------------------------------------------
+#  BACKGROUND JOB QUEUE
+# ---------------------------------------------------------------------------
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function to stop early after ``Job.cancel()``."""
+
+
+class Job:
+    """One unit of background work. Worker code reports progress through ``phase``
+    and ``partial`` and checks ``cancelled()``; it must not call Streamlit."""
+
+    def __init__(self, kind: str, meta: Optional[dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.meta = dict(meta or {})
+        self.status = QUEUED
+        self.phase = "Queued…"
+        self.partial = ""               # streamed text so far
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.created = time.time()
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def add_done_callback(self, fn):
+        """Call ``fn(job)`` once the job finishes (right away if it already has)."""
+        with self._lock:
+            if not self.finished:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self, status: str, result=None, error: Optional[BaseException] = None):
+        with self._lock:
+            self.result, self.error = result, error
+            self.finished_at = time.time()
+            self.status = status
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:
+                pass  # a failing callback must not take the worker down
+
+
+class JobQueue:
+    """Process-wide worker pool; jobs are looked up by id from any session.
+
+    Finished jobs stay retrievable for ``ttl`` seconds so a session that
+    navigated away (or reconnected) can still pick up the result.
+    """
+
+    def __init__(self, max_workers: int = 16, ttl: float = 3600.0, metrics=None):
+        self.ttl = ttl
+        self.metrics = metrics
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: dict = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn, *args, meta: Optional[dict] = None, **kwargs) -> Job:
+        """Run ``fn(job, *args, **kwargs)`` on a worker; returns the job immediately."""
+        job = Job(kind, meta)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        if job.cancelled():
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        started = time.perf_counter()
+        try:
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job._finish(FAILED, error=e)
+        else:
+            job._finish(CANCELLED if job.cancelled() else DONE, result=result)
+        if self.metrics is not None:
+            self.metrics.observe("job_seconds", time.perf_counter() - started, kind=job.kind, status=job.status)
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: Optional[str]) -> bool:
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel()
+        return True
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
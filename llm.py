@@ -0,0 +1,228 @@
+import json, random, threading, time
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Optional
+
+# ---------------------------------------------------------------------------
+#  SHARED OPENAI CLIENT
+# ---------------------------------------------------------------------------
+# openai is imported on first use, not here: it is the slowest import of the
+# app (~0.8 s) and most screens never call the model.
+@lru_cache(maxsize=None)
+def retryable_errors() -> tuple:
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+    )
+
+
+class LLMBusyError(RuntimeError):
+    """Raised when no upstream slot frees up within the queue timeout."""
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After(-Ms) headers."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # HTTP-date form: fall back to our own backoff
+    return None
+
+
+class LLMClient:
+    """One pooled OpenAI client per process with timeouts, retries and a concurrency cap.
+
+    ``max_concurrency`` bounds the number of upstream requests (including open
+    streams) across every session; callers queue for a slot for at most
+    ``queue_timeout`` seconds. Failed attempts release their slot while they
+    back off.
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, timeout: float = 30.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 max_concurrency: int = 16, queue_timeout: float = 60.0, metrics=None):
+        self._client_args = {"api_key": api_key, "base_url": base_url, "timeout": timeout}
+        self._client_instance = None
+        self._client_lock = threading.Lock()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.metrics = metrics
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    @property
+    def _client(self):
+        """The OpenAI client, created (and openai imported) by the first call, on a job worker."""
+        with self._client_lock:
+            if self._client_instance is None:
+                import openai
+                # The SDK keeps one HTTP connection pool per client; its own retries are
+                # disabled so that only ours (which respect the semaphore) apply.
+                self._client_instance = openai.OpenAI(**self._client_args, max_retries=0)
+            return self._client_instance
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        hinted = retry_after(error)
+        if hinted is not None:
+            return min(hinted, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise LLMBusyError("Too many requests in progress, please try again shortly.")
+
+    def _count(self, name: str, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
+
+    def _observe(self, name: str, started: float, **labels):
+        if self.metrics is not None:
+            self.metrics.observe(name, time.perf_counter() - started, **labels)
+
+    def _with_retries(self, fn, labels: dict, max_retries: int):
+        for attempt in range(max_retries + 1):
+            self._acquire()
+            try:
+                return fn()
+            except retryable_errors() as e:
+                self._count("llm_errors_total", error=type(e).__name__, **labels)
+                if attempt == max_retries:
+                    raise
+                error = e
+            finally:
+                self._slots.release()
+            self._count("llm_retries_total", **labels)
+            time.sleep(self._backoff(attempt, error))
+
+    def chat(self, call: str = "chat", timeout: Optional[float] = None, max_retries: Optional[int] = None,
+             **kwargs):
+        """``chat.completions.create`` with retries; returns the completion.
+
+        ``call`` names the call site in the latency and token metrics;
+        ``timeout`` and ``max_retries`` override the client defaults.
+        """
+        labels = {"call": call, "model": kwargs.get("model")}
+        started = time.perf_counter()
+        out = self._with_retries(
+            lambda: self._client.chat.completions.create(timeout=timeout or self.timeout, **kwargs), labels,
+            self.max_retries if max_retries is None else max_retries,
+        )
+        self._observe("llm_seconds", started, **labels)
+        if self.metrics is not None:
+            self.metrics.record_usage(getattr(out, "usage", None), **labels)
+        return out
+
+    def stream(self, call: str = "chat", timeout: Optional[float] = None, max_retries: Optional[int] = None,
+               **kwargs):
+        """Yield chunks of a streamed completion.
+
+        Only opening the stream is retried; once chunks have been yielded a
+        failure is raised to the caller. The slot is held until the stream ends.
+        """
+        labels = {"call": call, "model": kwargs.get("model")}
+        max_retries = self.max_retries if max_retries is None else max_retries
+        started = time.perf_counter()
+        for attempt in range(max_retries + 1):
+            self._acquire()
+            try:
+                stream = self._client.chat.completions.create(
+                    timeout=timeout or self.timeout, stream=True,
+                    stream_options={"include_usage": True}, **kwargs
+                )
+            except retryable_errors() as e:
+                self._slots.release()
+                self._count("llm_errors_total", error=type(e).__name__, **labels)
+                if attempt == max_retries:
+                    raise
+                self._count("llm_retries_total", **labels)
+                time.sleep(self._backoff(attempt, e))
+                continue
+            except BaseException:
+                self._slots.release()
+                raise
+            first = True
+            try:
+                for chunk in stream:
+                    if first:
+                        self._observe("llm_first_token_seconds", started, **labels)
+                        first = False
+                    if self.metrics is not None and getattr(chunk, "usage", None):
+                        self.metrics.record_usage(chunk.usage, **labels)
+                    yield chunk
+            finally:
+                stream.close()
+                self._slots.release()
+                self._observe("llm_seconds", started, **labels)
+            return
+
+
+# ---------------------------------------------------------------------------
+#  OFFLINE STUB
+# ---------------------------------------------------------------------------
+@lru_cache(maxsize=None)
+def stub_errors() -> dict:
+    """Exceptions StubLLM raises for ``fail_models``: openai's own types, without an HTTP exchange behind them."""
+    import openai
+
+    class StubTimeoutError(openai.APITimeoutError):
+        def __init__(self, model: str):
+            Exception.__init__(self, f"Request timed out ({model}, stub).")
+            self.message, self.request, self.body, self.code = str(self), None, None, None
+
+    class StubRateLimitError(openai.RateLimitError):
+        def __init__(self, model: str):
+            Exception.__init__(self, f"Rate limit reached for {model} (stub).")
+            self.message, self.request, self.response, self.body, self.code = str(self), None, None, None, None
+            self.status_code = 429
+
+    return {"timeout": StubTimeoutError, "rate_limit": StubRateLimitError}
+
+
+class StubLLM:
+    """Drop-in stand-in for LLMClient that never touches the network.
+
+    Replies echo the last message; JSON-mode replies carry the text under both
+    the ``persona_description`` and ``answer`` keys the app reads.
+    ``fail_models`` maps model names to ``"timeout"`` or ``"rate_limit"`` to
+    simulate an unhealthy upstream model.
+    """
+
+    def __init__(self, latency: float = 0.0, fail_models: Optional[dict] = None):
+        self.latency = latency
+        self.fail_models = dict(fail_models or {})
+        self.calls = 0
+        self.models = []                # model of every call, failed ones included
+        self._lock = threading.Lock()
+
+    def _reply(self, messages, model: Optional[str] = None) -> str:
+        with self._lock:
+            self.calls += 1
+            self.models.append(model)
+        if model in self.fail_models:
+            raise stub_errors()[self.fail_models[model]](model)
+        time.sleep(self.latency)
+        return f"[stub] {messages[-1]['content'][:120]}"
+
+    def chat(self, call: str = "chat", timeout: Optional[float] = None, **kwargs):
+        text = self._reply(kwargs["messages"], kwargs.get("model"))
+        if kwargs.get("response_format", {}).get("type") == "json_object":
+            text = json.dumps({"persona_description": text, "answer": text})
+        message = SimpleNamespace(role="assistant", content=text)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], model=kwargs.get("model"), usage=None)
+
+    def stream(self, call: str = "chat", timeout: Optional[float] = None, **kwargs):
+        for word in self._reply(kwargs["messages"], kwargs.get("model")).split(" "):
+            delta = SimpleNamespace(content=word + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
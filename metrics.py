@@ -0,0 +1,153 @@
+import json, threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+# ---------------------------------------------------------------------------
+#  IN-PROCESS METRICS
+# ---------------------------------------------------------------------------
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Lifetime count/sum plus a rolling window of recent values for percentiles."""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def snapshot(self):
+        """(count, total, sorted recent values); take it while holding the registry lock."""
+        return self.count, self.total, sorted(self.recent)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Metrics:
+    """Thread-safe registry of timing histograms and counters.
+
+    Every observation can also be appended to an NDJSON log; ``prometheus()``
+    renders the current state in the Prometheus text exposition format.
+    """
+
+    def __init__(self, window: int = 1024, log_path: Optional[str] = None, prefix: str = "mph_"):
+        self.window = window
+        self.log_path = log_path
+        self.prefix = prefix
+        self._histograms: dict = {}
+        self._counters: dict = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def _log(self, kind: str, name: str, value: float, labels: dict):
+        if not self.log_path:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "type": kind, "metric": name,
+                           "value": value, "labels": labels}, ensure_ascii=False)
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass  # metrics must never take the app down
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(self.window)
+            hist.observe(value)
+            self._log("observe", name, value, labels)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._log("inc", name, value, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Record the duration of the block in seconds, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record_usage(self, usage, **labels):
+        """Add the token counts of an OpenAI ``usage`` object to the token counters.
+
+        ``kind="cached"`` counts prompt tokens served from the provider's prompt cache.
+        """
+        if usage is None:
+            return
+        for kind in ("prompt_tokens", "completion_tokens"):
+            count = getattr(usage, kind, None)
+            if count:
+                self.inc("llm_tokens_total", count, kind=kind.split("_")[0], **labels)
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if cached:
+            self.inc("llm_tokens_total", cached, kind="cached", **labels)
+
+    # -- export ----------------------------------------------------------------
+    def summary(self) -> list:
+        """One row per histogram, for tables in the admin panel."""
+        rows = []
+        for (name, labels), (count, total, values) in self._histogram_snapshots():
+            row = {"metric": name, **dict(labels), "count": count,
+                   "mean_ms": round(1000 * total / count, 1) if count else 0.0}
+            for q in PERCENTILES:
+                row[f"p{int(q * 100)}_ms"] = round(1000 * percentile(values, q), 1)
+            rows.append(row)
+        return rows
+
+    def _histogram_snapshots(self) -> list:
+        with self._lock:
+            return sorted((key, hist.snapshot()) for key, hist in self._histograms.items())
+
+    def counters(self) -> list:
+        with self._lock:
+            items = list(self._counters.items())
+        return [{"metric": name, **dict(labels), "value": value} for (name, labels), value in sorted(items)]
+
+    def prometheus(self) -> str:
+        histograms = self._histogram_snapshots()
+        with self._lock:
+            counters = sorted(self._counters.items())
+        lines, typed = [], set()
+        for (name, labels), (count, total, values) in histograms:
+            metric = self.prefix + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} summary")
+                typed.add(metric)
+            for q in PERCENTILES:
+                lines.append(f"{metric}{_labels(labels + (('quantile', q),))} {percentile(values, q):.6f}")
+            lines.append(f"{metric}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            metric = self.prefix + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
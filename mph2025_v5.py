@@ -1,59 +1,23 @@
 import streamlit as st
-import openai, json, os
-from pydantic import BaseModel
+import hashlib, hmac, json, os, re, secrets
+from assets import SPACER_HTML, STYLE_SHEET, logo_html
+from cache import LRUCache, SingleFlight, persona_key
+from conversation import Conversation
+from jobs import DONE, FAILED, JobQueue
+from llm import LLMClient
+from metrics import Metrics
+from personas import (
+    BOOKS, EXPERTS, STYLES, PERSONA_CACHE_FILE, PERSONA_CACHE_SIZE, PERSONA_CACHE_TTL, PERSONA_PROMPT_VERSION,
+)
+from routing import ROUTING_FILE, Router, load_routing
+from storage import Shards
+from transfer import FORMATS, MIME, export_file
+from workers import cached_answer, generate_answer, generate_persona, save_when_done
 
 # ---------------------------------------------------------------------------
 #  📐  GLOBAL STYLE SHEET
 # ---------------------------------------------------------------------------
-st.markdown(
-    """
-    <style>
-    body{background:linear-gradient(135deg,#2fe273 0%,#09742a 100%)!important;min-height:100vh;}
-    .stApp{
-      background:linear-gradient(335deg,#2fe273 0%,#09742a 100%)!important;
-      border-radius:32px;
-      max-width:400px;
-      min-height:730px;
-      margin:32px auto;
-      box-shadow:0 8px 32px rgba(60,60,60,.25),0 1.5px 8px rgba(30,90,40,.06);
-      border:3px solid #ffffff;
-      display:flex;
-      flex-direction:column;
-      align-items:center;
-      padding:10px 10px 10px;
-    }
-    .biglabel{font-size:1.4em;font-weight:800;color:#ffffff;margin:4px 0 10px;text-align:center;letter-spacing:.5px;}
-    .frame-avatar{font-size:1.4em;margin:6px 0 6px;display:flex;justify-content:center;color:#ffffff;}
-
-    .stButton>button{
-      border-radius:26px!important;
-      font-weight:700!important;
-      font-size:.9em!important;
-      padding:.8em 0!important;
-      background:#27e67a!important;
-      color:#ffffff!important;
-      margin:6px 0!important;
-      width:100%!important;
-    }
-    .top-nav-container {
-      padding: 12px 12px 12px 12px !important;
-      border-radius: 32px !important;
-      margin: -10px -10px 24px -10px !important;
-      width: calc(100% + 20px) !important;
-    }
-
-    /* --- Top nav button colors: HIGH SPECIFICITY! --- */
-    .top-nav-container > div[data-testid="stHorizontalBlock"] > div > div[data-testid="stButton"][data-key="nav_home"] > button { background: #e63946 !important; }
-    .top-nav-container > div[data-testid="stHorizontalBlock"] > div > div[data-testid="stButton"][data-key="nav_chat"] > button { background: #27e67a !important; }
-    .top-nav-container > div[data-testid="stHorizontalBlock"] > div > div[data-testid="stButton"][data-key="nav_saved"] > button { background: #1d3557 !important; }
-
-    /* --- Answer bubble --- */
-    .answer-box{background:#23683c;border-radius:12px;padding:14px 18px;color:#fff;white-space:pre-wrap;margin-top:8px;}
-    @media (max-height:750px){.stApp{min-height:640px;}}
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+st.markdown(STYLE_SHEET, unsafe_allow_html=True)
 
 # ---------------------------------------------------------------------------
 #  TOP NAVIGATION
@@ -67,11 +31,11 @@ def render_top_nav():
             st.rerun()
     with col2:
         if st.button("💬 Chat", key="nav_chat"):
-            st.session_state.step = 6 if st.session_state.profiles else 1
+            st.session_state.step = 6 if profiles else 1
             st.rerun()
     with col3:
         if st.button("📂 Saved", key="nav_saved"):
-            if st.session_state.saved_responses:
+            if saved_count:
                 st.session_state.step = 7
             else:
                 st.warning("No saved responses yet.")
@@ -83,6 +47,13 @@ def render_top_nav():
 # ---------------------------------------------------------------------------
 PROFILES_FILE = "parent_helpers_profiles.json"
 RESPONSES_FILE = "parent_helpers_responses.json"
+DB_FILE = "parent_helpers.db"      # pre-sharding global store, migrated once into the legacy user's shard
+USERS_DIR = "parent_helpers_users"  # one SQLite shard per user + manifest.db
+USER_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{12,64}$")
+ACCOUNT_KEY_PREFIX = "acct:"        # ':' is outside USER_KEY_PATTERN, so no ?u= link can name an account
+ANSWER_CACHE_SIZE = 1024
+ANSWER_CACHE_TTL = 24 * 3600        # seconds; None keeps answers until evicted
+PAGE_SIZE = 20                      # rows per page in Saved Chats / My Profiles
 
 def load_json(path: str):
     if not os.path.exists(path):
@@ -94,45 +65,192 @@ def load_json(path: str):
         st.error(f"Error loading {path}: {e}")
         return []
 
-def save_json(path: str, data):
+@st.cache_resource
+def get_metrics():
+    return Metrics(log_path=st.secrets.get("metrics_log"))
+
+@st.cache_resource
+def get_shards():
+    shards = Shards(USERS_DIR, metrics=get_metrics())
+    if shards.needs_legacy_migration():  # the old global data goes to one user (see README)
+        legacy_user = st.secrets.get("legacy_user") or shards.legacy_key()
+        shards.migrate_legacy(legacy_user, DB_FILE, load_json(PROFILES_FILE), load_json(RESPONSES_FILE))
+    return shards
+
+def user_key() -> str:
+    """Storage partition of this visitor: the signed-in account when st.login is set up,
+    otherwise the private ?u=<key> link, generated on the first visit."""
+    if "user_key" in st.session_state:
+        return st.session_state.user_key
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-    except Exception as e:
-        st.error(f"Error writing {path}: {e}")
+        email = st.user.email if st.user.is_logged_in else None
+    except Exception:  # no auth configured (or a Streamlit without st.user)
+        email = None
+    if email:
+        # Keyed with a server-side secret: knowing an email is not enough to compute its key.
+        secret = st.secrets.get("user_key_secret") or get_shards().account_secret()
+        digest = hmac.new(secret.encode("utf-8"), email.strip().lower().encode("utf-8"), hashlib.sha256)
+        key = ACCOUNT_KEY_PREFIX + digest.hexdigest()[:32]
+    else:
+        key = st.query_params.get("u")
+        if not key or not USER_KEY_PATTERN.match(key):
+            key = secrets.token_urlsafe(12)
+        st.query_params["u"] = key
+    st.session_state.user_key = key
+    return key
+
+def get_store():
+    """This user's shard."""
+    return get_shards().store(user_key())
+
+def get_read_model():
+    return get_shards().read_model(user_key())
+
+@st.cache_resource
+def get_persona_cache():
+    return LRUCache(maxsize=PERSONA_CACHE_SIZE, ttl=PERSONA_CACHE_TTL, path=PERSONA_CACHE_FILE)
+
+@st.cache_resource
+def get_answer_cache():
+    return LRUCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+
+@st.cache_resource
+def get_llm():
+    return LLMClient(
+        api_key=st.secrets.get("openai_key", "YOUR_OPENAI_API_KEY"),
+        base_url=st.secrets.get("openai_base_url"),
+        timeout=float(st.secrets.get("openai_timeout", 30)),
+        max_retries=int(st.secrets.get("openai_max_retries", 3)),
+        max_concurrency=int(st.secrets.get("openai_max_concurrency", 16)),
+        metrics=get_metrics(),
+    )
+
+@st.cache_resource
+def get_router():
+    """Picks the model tier for every LLM call (see model_routing.json)."""
+    return Router(get_llm(), load_routing(st.secrets.get("model_routing", ROUTING_FILE)), metrics=get_metrics())
+
+@st.cache_resource
+def get_inflight():
+    """Coalesces identical persona/chat requests that are in flight across all sessions."""
+    return SingleFlight()
+
+@st.cache_resource
+def get_jobs():
+    """Process-wide worker pool for LLM calls; sessions keep only job ids."""
+    return JobQueue(max_workers=int(st.secrets.get("job_workers", 16)), metrics=get_metrics())
+
+def turn_html(turn: dict) -> str:
+    if turn["role"] == "assistant":
+        return f"<div class='answer-box'>{turn['content']}</div>"
+    return f"""<blockquote style="color:#fff;border-left:4px solid #27e67a;padding-left:8px;margin:8px 0 4px;">
+                 {turn['content']}
+               </blockquote>"""
+
+def render_thread(conv, container):
+    """Draw every turn of a conversation into ``container``."""
+    for turn in conv.history:
+        container.markdown(turn_html(turn), unsafe_allow_html=True)
+
+def start_persona_request(bypass_cache: bool = False):
+    """Resolve the persona from the cache, or start generating it in the background."""
+    st.session_state.pop("persona_description", None)
+    st.session_state.pop("persona_error", None)
+    get_jobs().cancel(st.session_state.pop("persona_job", None))
+    source_type, source_name = st.session_state.source_type, st.session_state.source_name
+    cache_key = persona_key(source_type, source_name, PERSONA_PROMPT_VERSION)
+    cached = None if bypass_cache else get_persona_cache().get(cache_key)
+    if cached:
+        st.session_state.persona_description = cached
+        return
+    job = get_jobs().submit(
+        "persona", generate_persona, get_router(), get_persona_cache(), get_inflight(), source_type, source_name, cache_key
+    )
+    st.session_state.persona_job = job.id
+
+def collect_persona_job():
+    """Hand a finished persona job to this session, whichever page it is on now."""
+    ss = st.session_state
+    job = get_jobs().get(ss.get("persona_job"))
+    if "persona_job" in ss and (job is None or job.finished):
+        del ss["persona_job"]
+        if job is not None and job.status == DONE:
+            ss.persona_description = job.result
+        elif job is not None and job.status == FAILED:
+            ss.persona_error = str(job.error)
+
+def collect_chat_job():
+    """Move a finished chat job into its conversation (called by the query area)."""
+    ss = st.session_state
+    job = get_jobs().get(ss.get("chat_job"))
+    if "chat_job" in ss and (job is None or job.finished):
+        del ss["chat_job"]
+        if job is not None and job.status == DONE:
+            add_answer(job.meta["profile_id"], job.meta["query"], job.result, job.meta.get("tier"))
+        elif job is not None and job.status == FAILED:
+            ss.chat_error = str(job.error)
+
+def add_answer(profile_id: str, query: str, answer: str, tier=None):
+    ss = st.session_state
+    conv = ss.setdefault("conversations", {}).setdefault(profile_id, Conversation())
+    conv.add("user", query)
+    conv.add("assistant", answer)
+    ss.last_answer = answer
+    ss.last_answer_profile = profile_id
+    ss.last_tier = tier
+
+@st.fragment(run_every=0.3)
+def render_job_progress(job_id: str):
+    """Auto-refreshing view of a running persona job; hands over to a full rerun once it finishes."""
+    job = get_jobs().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    if job.partial:
+        st.markdown(f"<div class='answer-box'>{job.partial}▌</div>", unsafe_allow_html=True)
+    else:
+        st.info(job.phase)
+
+def current_page(key: str, filters) -> int:
+    """Page index of a paged list; back to the first page whenever its filters change."""
+    if st.session_state.get(f"{key}_filters", filters) != filters:
+        st.session_state[f"{key}_page"] = 0
+        st.session_state.pop(f"{key}_select", None)
+    st.session_state[f"{key}_filters"] = filters
+    return st.session_state.get(f"{key}_page", 0)
+
+def render_pager(key: str, page: int, total: int):
+    pages = max(1, -(-total // PAGE_SIZE))
+    c1, c2, c3 = st.columns([1, 2, 1])
+    with c1:
+        if st.button("◀ PREV", key=f"{key}_prev", disabled=page == 0):
+            st.session_state[f"{key}_page"] = page - 1
+            st.session_state.pop(f"{key}_select", None)
+            st.rerun()
+    c2.caption(f"Page {page + 1} of {pages} · {total} total")
+    with c3:
+        if st.button("NEXT ▶", key=f"{key}_next", disabled=page >= pages - 1):
+            st.session_state[f"{key}_page"] = page + 1
+            st.session_state.pop(f"{key}_select", None)
+            st.rerun()
 
-for key, default in {
-    "profiles":        load_json(PROFILES_FILE),
-    "saved_responses": load_json(RESPONSES_FILE),
-    "last_answer":     "",
-}.items():
-    st.session_state.setdefault(key, default)
+def render_export(table: str):
+    """Download all of this user's ``table``; the file is only generated when the button is clicked."""
+    store = get_store()  # resolved now: the download callable runs on another thread
+    c1, c2 = st.columns([1, 2])
+    fmt = c1.selectbox("Format", FORMATS, key=f"{table}_export_format", label_visibility="collapsed")
+    c2.download_button(f"⬇ EXPORT ({fmt.upper()})", data=lambda: export_file(store, table, fmt),
+                       file_name=f"{table}.{fmt}", mime=MIME[fmt], key=f"{table}_export", on_click="ignore")
+
+st.session_state.setdefault("last_answer", "")
+collect_persona_job()  # chat jobs are collected inside the query area fragment (step 6)
+
+# Shared, read-only snapshots: sessions keep only ids (widget state), never copies.
+profiles = get_read_model().profiles()
+saved_count = get_read_model().response_count()  # the list itself is paged in step 7
+get_persona_cache()  # loads prewarmed personas (see prewarm_personas.py) once per process
 
 step = st.session_state.get("step", 0)
-openai.api_key = st.secrets.get("openai_key", "YOUR_OPENAI_API_KEY")
-
-BOOKS = [
-    "Parenting with Presence", "Parenting Without Power Struggles",
-    "Peaceful Parent, Happy Kids", "Permission to Parent",
-    "Positive Parenting: An Essential Guide", "Punished by Rewards"
-]
-EXPERTS = [
-    "Dr. Laura Markham", "Dr. Daniel Siegel", "Dr. Ross Greene",
-    "Janet Lansbury", "Adele Faber"
-]
-STYLES = [
-    "Positive Parenting", "Authoritative", "Permissive",
-    "Attachment Parenting", "Montessori", "Gentle Parenting"
-]
-
-class PersonaProfile(BaseModel):
-    profile_name: str
-    parent_name: str
-    child_name: str
-    child_age: int
-    source_type: str
-    source_name: str
-    persona_description: str
+STREAM_ANSWERS = st.secrets.get("stream_answers", True)  # render chat answers token by token
 
 SHORTCUTS = ["💬 DEFAULT","🤝 CONNECT","🌱 GROW","🔍 EXPLORE","🛠 RESOLVE","❤ SUPPORT"]
 EMOJIS = {"💬 DEFAULT":"💬","🤝 CONNECT":"🤝","🌱 GROW":"🌱","🔍 EXPLORE":"🔍","🛠 RESOLVE":"🛠","❤ SUPPORT":"❤"}
@@ -146,388 +264,484 @@ TOOLTIPS = {
 }
 
 # ---------------------------------------------------------------------------
-#  STEP LOGIC
+#  STEP 6 FRAGMENTS  (each reruns on its own; the rest of the page stays put)
 # ---------------------------------------------------------------------------
-if step == 0:
-    st.markdown(
-        """
-        <div style="text-align:center;">
-          <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="160" />
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-    st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
-    row1c1, row1c2 = st.columns(2)
-    with row1c1:
-        if st.button("SAVED PROFILES", key="home_profiles"):
-            if st.session_state.profiles:
-                st.session_state.step = 8
-                st.rerun()
-            else:
-                st.warning("No profiles yet.")
-    with row1c2:
-        if st.button("NEW PROFILE", key="home_create"):
-            st.session_state.step = 1
-            st.rerun()
-    st.markdown("<div style='height:12px'></div>", unsafe_allow_html=True)
-    row2c1, row2c2 = st.columns(2)
-    with row2c1:
-        if st.button("CHAT", key="home_chat"):
-            st.session_state.step = 6 if st.session_state.profiles else 1
-            if not st.session_state.profiles:
-                st.warning("No profiles – create one first.")
-            st.rerun()
-    with row2c2:
-        if st.button("SAVED CHATS", key="home_saved"):
-            if st.session_state.saved_responses:
-                st.session_state.step = 7
-                st.rerun()
-            else:
-                st.warning("No saved responses yet!")
-
-elif step == 1:
-    render_top_nav() 
-    st.markdown(
-            """
-            <div style="text-align:center;">
-              <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
+# The fragments share state only through st.session_state: the card owns
+# "chat_profile", the picker owns "shortcut", and the query area reads both.
+# A new profile changes what the query area shows, so it reruns the whole app.
+def profile_changed():
+    st.session_state.chat_profile_changed = True
+
+@st.fragment
+def render_profile_card():
+    with get_metrics().timer("fragment_render_seconds", fragment="profile_card"):
+        names = {p["id"]: p["profile_name"] for p in profiles}
+        col_dd, col_icon = st.columns([4,1])
+        sel_id = col_dd.selectbox("Parenting Agent Profiles:", list(names), format_func=lambda i: names[i],
+                                  key="chat_profile", on_change=profile_changed)
+        if st.session_state.pop("chat_profile_changed", False):
+            st.rerun(scope="app")
+        sel = get_read_model().profile(sel_id)
+        tooltip = (
+            f"Profile: {sel['profile_name']} "
+            f"Type: {sel['source_type']} "
+            f"Source: {sel['source_name']} "
+            f"Child: {sel['child_name']} "
+            f"Age: {sel['child_age']} "
+            f"Parent: {sel['parent_name']} "
+            f"Persona: {sel['persona_description']}"
+        )
+        col_icon.markdown(
+            f'<span title="{tooltip}" style="font-size:1.5em; cursor:help;">ℹ️</span>',
+            unsafe_allow_html=True,
+        )
+        st.markdown(
+            f"""
+            <div style="
+              background: #d3d3d3;
+              padding: 12px;
+              border-radius: 8px;
+              margin-top: 12px;
+            ">
+              <div style="margin-bottom:8px;">
+                <span style="color:#27e67a;font-weight:700;font-size:1.2em;">ACTIVE AGENT</span>
+              </div>
+              <div style="display:flex;justify-content:space-between;flex-wrap:wrap;">
+                <div><span style="color:#27e67a;font-weight:600;">Profile:</span>
+                     <span style="color:#000;font-weight:500;">{sel['profile_name']}</span></div>
+                <div><span style="color:#27e67a;font-weight:600;">Source:</span>
+                     <span style="color:#000;font-weight:500;">{sel['source_name']}</span></div>
+                <div><span style="color:#27e67a;font-weight:600;">Child Age:</span>
+                     <span style="color:#000;font-weight:500;">{sel['child_age']}</span></div>
+              </div>
             </div>
             """,
-            unsafe_allow_html=True,)
-    st.markdown('<div class="biglabel">Select A Parenting Source Type</div>', unsafe_allow_html=True)
-    st.markdown('<div class="frame-avatar"></div>', unsafe_allow_html=True)
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        if st.button("📚  Book", key="btn_book"):
-            st.session_state.source_type = "Book"
-            st.session_state.step = 2
-            st.rerun()
-    with col2:
-        if st.button("🧑‍  Expert", key="btn_expert"):
-            st.session_state.source_type = "Expert"
-            st.session_state.step = 2
-            st.rerun()
-    with col3:
-        if st.button("🌟  Style", key="btn_style"):
-            st.session_state.source_type = "Style"
-            st.session_state.step = 2
-            st.rerun()
+            unsafe_allow_html=True,
+        )
 
-elif step == 2:
-    st.markdown(
-                """
-                <div style="text-align:center;">
-                  <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
-                </div>
-                """,
-                unsafe_allow_html=True,) 
-    st.markdown(f'<div class="biglabel">Choose a {st.session_state.source_type}</div>', unsafe_allow_html=True)
-    options = BOOKS if st.session_state.source_type == "Book" else EXPERTS if st.session_state.source_type == "Expert" else STYLES
-    emoji = "📚" if st.session_state.source_type == "Book" else "🧑‍" if st.session_state.source_type == "Expert" else "🌟"
-    st.markdown(f'<div class="frame-avatar">{emoji}</div>', unsafe_allow_html=True)
-    choice = st.selectbox("Select or enter your own:", options + ["Other..."])
-    custom = st.text_input("Enter custom name") if choice == "Other..." else ""
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("BACK", key="btn_back_step2"):
-            st.session_state.step = 1
-            st.rerun()
-    with col2:
-        if st.button("CREATE", key="btn_create_step2"):
-            src_name = custom if choice == "Other..." else choice
-            if not src_name:
-                st.warning("Please provide a name.")
-            else:
-                st.session_state.source_name = src_name
-                st.session_state.step = 3
-                st.rerun()
+@st.fragment
+def render_shortcut_picker():
+    with get_metrics().timer("fragment_render_seconds", fragment="shortcut_picker"):
+        st.session_state.setdefault("shortcut", "💬 DEFAULT")
+        cols = st.columns(len(SHORTCUTS))
+        for i, sc in enumerate(SHORTCUTS):
+            with cols[i]:
+                if st.button(EMOJIS[sc], key=f"type_{sc}", help=TOOLTIPS[sc]):
+                    st.session_state.shortcut = sc
+        st.markdown(
+            f"""
+            <div style="background:#fff;color:#000;padding:12px;border-radius:8px;margin-top:12px;margin-bottom:12px;">
+              <strong>Selected:</strong> {st.session_state.shortcut}
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
 
-elif step == 3:
-    st.markdown(
-        """
-        <div style="text-align:center;">
-            <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
-        </div>
-        """,
-        unsafe_allow_html=True,
+# The query area's buttons act in on_click callbacks, which run before the
+# fragment redraws: a click reruns only the fragment, and it already shows the
+# new state. Only a page change (or a deleted profile) reruns the whole app.
+def send_query():
+    """SEND: answer from the cache right away, otherwise start a background job."""
+    ss = st.session_state
+    sel = get_read_model().profile(ss.get("chat_profile"))
+    if sel is None:  # deleted by another session; the query area redraws the step
+        return
+    job = get_jobs().get(ss.get("chat_job"))
+    if job:  # one answer at a time per session
+        ss.chat_notice = (
+            "Still answering your last question: wait for it or cancel it." if job.meta["profile_id"] == sel["id"]
+            else f"Still answering a question for {job.meta['profile_name']}. Switch back to it to wait or cancel."
+        )
+        return
+    conv = ss.setdefault("conversations", {}).setdefault(sel["id"], Conversation())
+    query, shortcut, skip = ss.get("chat_query", ""), ss.shortcut, ss.get("chat_skip_cache", False)
+    # A thread over its budget is compacted first, which can take an LLM call: then the job looks it up.
+    lookup = not skip and not conv.over_budget()
+    answer = cached_answer(get_answer_cache(), conv, sel, shortcut, query) if lookup else None
+    if answer is not None:
+        add_answer(sel["id"], query, answer)
+        return
+    job = get_jobs().submit(
+        "chat", generate_answer, get_router(), get_answer_cache(), get_inflight(), conv, dict(sel),
+        shortcut, query, skip or lookup, STREAM_ANSWERS,  # a looked-up miss is not counted twice
+        meta={"profile_id": sel["id"], "profile_name": sel["profile_name"], "shortcut": shortcut, "query": query},
     )
-    import time
-    st.markdown('<div class="biglabel">GENERATING YOUR PARENTING AGENT PERSONA</div>', unsafe_allow_html=True)
-    st.markdown('<div class="frame-avatar">🧠✨</div>', unsafe_allow_html=True)
-    placeholder = st.empty()
-    for msg in ["Assimilating Knowledge…", "Synthesizing Information…", "Assessing Results…", "Generating Persona…"]:
-        placeholder.info(msg)
-        time.sleep(0.5)
-    if "persona_description" not in st.session_state:
-        with st.spinner("Thinking…"):
-            try:
-                prompt = (
-                    f"Summarize the parenting philosophy, core principles, and practices of "
-                    f"the {st.session_state.source_type} '{st.session_state.source_name}' in under 200 words. "
-                    "Respond in a JSON object with 'persona_description'."
-                )
-                out = openai.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": prompt}],
-                    response_format={"type": "json_object"},
-                )
-                raw = out.choices[0].message.content
-                st.session_state.persona_description = json.loads(raw)["persona_description"]
-            except Exception as e:
-                st.error(f"OpenAI API error: {e}")
-    placeholder.empty()
-    desc = st.session_state.get("persona_description")
-    if desc:
-        st.info(desc)
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("RETRY", key="btn_retry"):
-            st.session_state.pop("persona_description", None)
-            st.rerun()
-    with col2:
-        if st.button("SAVE", key="btn_save_persona"):
-            st.session_state.step = 4
-            st.rerun()
+    ss.chat_job = job.id
+
+def cancel_chat():
+    get_jobs().cancel(st.session_state.pop("chat_job", None))
 
-elif step == 4:
-    st.markdown(
-                """
-                <div style="text-align:center;">
-                  <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
-                </div>
-                """,
-                unsafe_allow_html=True,)
-    st.markdown('<div class="biglabel">PARENTING AGENT DETAILS</div>', unsafe_allow_html=True)
-    st.markdown('<div class="frame-avatar">📷</div>', unsafe_allow_html=True)
-    with st.form("profile"):
-        p_name = st.text_input("Parent first name")
-        c_age  = st.number_input("Child age", 1, 21)
-        c_name = st.text_input("Child first name")
-        prof_nm= st.text_input("Profile name")
-        saved  = st.form_submit_button("SAVE")
-    if saved:
-        if not all([p_name, c_age, c_name, prof_nm]):
-            st.warning("Please fill every field.")
+def save_when_ready(job_id: str):
+    """SAVE WHEN READY: the record comes from what the job was sent with, not the current selection."""
+    job = get_jobs().get(job_id)
+    if job is None or job.meta.get("save"):
+        return
+    meta = job.meta
+    meta["save"] = True
+    record = {"profile": meta["profile_name"], "shortcut": meta["shortcut"], "question": meta["query"]}
+    store = get_store()  # resolved now: the callback runs outside this session
+    thread = st.session_state.conversations[meta["profile_id"]]
+    job.add_done_callback(lambda job: save_when_done(job, store, thread, record))
+
+def new_chat(profile_id: str):
+    ss = st.session_state
+    job = get_jobs().get(ss.get("chat_job"))
+    if job and job.meta["profile_id"] == profile_id:
+        cancel_chat()
+    ss.conversations.pop(profile_id, None)
+    ss.last_answer = ""
+    ss.pop("last_answer_profile", None)
+    ss.pop("last_tier", None)
+
+@st.fragment(run_every=0.3)
+def render_chat_progress(job_id: str):
+    """Live answer of a running chat job, redrawn on its own timer.
+
+    A finished answer stays here until the query area next reruns and moves it
+    into the thread; a nested fragment cannot rerun its parent short of the whole app.
+    """
+    job = get_jobs().get(job_id)
+    if job is None:
+        return
+    if job.cancelled():
+        st.caption("Cancelled.")
+    elif job.status == DONE:
+        st.markdown(f"<div class='answer-box'>{job.result}</div>", unsafe_allow_html=True)
+    elif job.status == FAILED:
+        st.error(f"OpenAI API error: {job.error}")
+    elif not job.finished:
+        if job.partial:
+            st.markdown(f"<div class='answer-box'>{job.partial}▌</div>", unsafe_allow_html=True)
         else:
-            profile = PersonaProfile(
-                profile_name=prof_nm,
-                parent_name=p_name,
-                child_name=c_name,
-                child_age=int(c_age),
-                source_type=st.session_state.source_type,
-                source_name=st.session_state.source_name,
-                persona_description=st.session_state.persona_description
-            )
-            st.session_state.profiles.append(profile.dict())
-            save_json(PROFILES_FILE, st.session_state.profiles)
-            st.success("Profile saved!")
-            st.session_state.step = 5
-            st.rerun()
-    if st.button("BACK", key="btn_back_details"):
-        st.session_state.step = 3
-        st.rerun()
-elif step == 5:
-    st.markdown(
-            """
-            <div style="text-align:center;">
-              <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
-            </div>
-            """,
-            unsafe_allow_html=True,)
-    render_top_nav() 
-    st.markdown('<div class="biglabel">PARENTING AGENT PROFILE CREATED! 🎉</div>', unsafe_allow_html=True)
-    st.markdown('<div class="frame-avatar">📝🎉</div>', unsafe_allow_html=True)
-
-elif step == 6:
-    st.markdown(
-                """
-                <div style="text-align:center;">
-                  <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
-                </div>
-                """,
-                unsafe_allow_html=True,)
-    render_top_nav() 
-    st.markdown('<div class="biglabel">1. SELECT A PARENTING AGENT</div>', unsafe_allow_html=True)
-    names = [p["profile_name"] for p in st.session_state.profiles]
-    col_dd, col_icon = st.columns([4,1])
-    idx = col_dd.selectbox("Parenting Agent Profiles:", range(len(names)),
-                          format_func=lambda i: names[i], key="chat_profile")
-    sel = st.session_state.profiles[idx]
-    tooltip = (
-        f"Profile: {sel['profile_name']} "
-        f"Type: {sel['source_type']} "
-        f"Source: {sel['source_name']} "
-        f"Child: {sel['child_name']} "
-        f"Age: {sel['child_age']} "
-        f"Parent: {sel['parent_name']} "
-        f"Persona: {sel['persona_description']}"
-    )
-    col_icon.markdown(
-        f'<span title="{tooltip}" style="font-size:1.5em; cursor:help;">ℹ️</span>',
-        unsafe_allow_html=True,
-    )
-    st.markdown(
-        f"""
-        <div style="
-          background: #d3d3d3;
-          padding: 12px;
-          border-radius: 8px;
-          margin-top: 12px;
-        ">
-          <div style="margin-bottom:8px;">
-            <span style="color:#27e67a;font-weight:700;font-size:1.2em;">ACTIVE AGENT</span>
-          </div>
-          <div style="display:flex;justify-content:space-between;flex-wrap:wrap;">
-            <div><span style="color:#27e67a;font-weight:600;">Profile:</span>
-                 <span style="color:#000;font-weight:500;">{sel['profile_name']}</span></div>
-            <div><span style="color:#27e67a;font-weight:600;">Source:</span>
-                 <span style="color:#000;font-weight:500;">{sel['source_name']}</span></div>
-            <div><span style="color:#27e67a;font-weight:600;">Child Age:</span>
-                 <span style="color:#000;font-weight:500;">{sel['child_age']}</span></div>
-          </div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-    st.markdown('<div class="biglabel">2. SELECT A RESPONSE TYPE</div>', unsafe_allow_html=True)
-    st.session_state.setdefault("shortcut", "💬 DEFAULT")
-    cols = st.columns(len(SHORTCUTS))
-    for i, sc in enumerate(SHORTCUTS):
-        with cols[i]:
-            if st.button(EMOJIS[sc], key=f"type_{sc}", help=TOOLTIPS[sc]):
-                st.session_state.shortcut = sc
-    st.markdown(
-        f"""
-        <div style="background:#fff;color:#000;padding:12px;border-radius:8px;margin-top:12px;margin-bottom:12px;">
-          <strong>Selected:</strong> {st.session_state.shortcut}
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-    st.markdown('<div class="biglabel">3. WHAT DO YOU WANT TO ASK?</div>', unsafe_allow_html=True)
-    query = st.text_area("Type here", key="chat_query")
-    if st.session_state.last_answer:
-        st.markdown(f"<div class='answer-box'>{st.session_state.last_answer}</div>", unsafe_allow_html=True)
-    col1, col2 = st.columns(2)
-    with col1:
-        if st.button("SAVE RESPONSE", key="save_response"):
-            record = {
-                "profile": sel["profile_name"],
-                "shortcut": st.session_state.shortcut,
-                "question": query,
-                "answer":   st.session_state.last_answer
-            }
-            if record not in st.session_state.saved_responses:
-                st.session_state.saved_responses.append(record)
-                save_json(RESPONSES_FILE, st.session_state.saved_responses)
-            st.session_state.step = 7
+            st.info(job.phase)
+        col1, col2 = st.columns(2)
+        col1.button("SAVE WHEN READY", key="save_when_ready", on_click=save_when_ready, args=(job_id,),
+                    disabled=bool(job.meta.get("save")))
+        col2.button("CANCEL", key="cancel_chat", on_click=cancel_chat)
+        if job.meta.get("save"):
+            st.success("The answer will be saved to Saved Chats when it is ready.")
+
+@st.fragment
+def render_query_area():
+    with get_metrics().timer("fragment_render_seconds", fragment="query_area"):
+        collect_chat_job()
+        sel = get_read_model().profile(st.session_state.get("chat_profile"))
+        if sel is None:  # profile deleted by another session: redraw the whole step
             st.rerun()
-    with col2:
-        if st.button("SEND", key="send_btn"):
-            base = (
-              f"You are a parenting coach with persona: {sel['persona_description']}."
-              f" Parent: {sel['parent_name']}, Child: {sel['child_name']}, Age: {sel['child_age']}."
-            )
-            extra_map = {
-              "🤝 CONNECT":" Help explain with examples.",
-              "🌱 GROW":" Offer advanced strategies.",
-              "🔍 EXPLORE":" Facilitate age-appropriate Q&A.",
-              "🛠 RESOLVE":" Provide step-by-step resolution.",
-              "❤ SUPPORT":" Offer empathetic support."
-            }
-            prompt = base + extra_map.get(st.session_state.shortcut, "") + "\n" + query + "\nRespond as JSON with 'answer'."
-            try:
-                out = openai.chat.completions.create(
-                  model="gpt-4o",
-                  messages=[{"role":"system","content":prompt}],
-                  response_format={"type":"json_object"}
+        # One conversation per profile for the lifetime of the session.
+        conv = st.session_state.setdefault("conversations", {}).setdefault(sel["id"], Conversation())
+        job = get_jobs().get(st.session_state.get("chat_job"))
+        # A job belongs to the profile it was sent to; the other profiles only see that it is busy.
+        pending = job if job and job.meta["profile_id"] == sel["id"] else None
+        # last_answer / last_tier belong to whichever profile's answer came in last.
+        own_last = st.session_state.get("last_answer_profile", sel["id"]) == sel["id"]
+        last_answer = st.session_state.last_answer if own_last else ""
+        thread = st.container()
+        render_thread(conv, thread)
+        if pending:
+            thread.markdown(turn_html({"role": "user", "content": pending.meta["query"]}), unsafe_allow_html=True)
+        query = st.text_area("Type here", key="chat_query")
+        if pending:
+            render_chat_progress(pending.id)
+        elif last_answer and not conv:
+            st.markdown(f"<div class='answer-box'>{last_answer}</div>", unsafe_allow_html=True)
+        if "chat_error" in st.session_state:
+            st.error(f"OpenAI API error: {st.session_state.pop('chat_error')}")
+        if "chat_notice" in st.session_state:
+            st.warning(st.session_state.pop("chat_notice"))
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("SAVE RESPONSE", key="save_response"):
+                if pending:
+                    st.warning("The answer is still coming in: SAVE WHEN READY saves it once it is done.")
+                else:
+                    record = {
+                        "profile": sel["profile_name"],
+                        "shortcut": st.session_state.shortcut,
+                        "question": conv.history[-2]["content"] if conv else query,
+                        "answer":   conv.history[-1]["content"] if conv else last_answer,
+                        "thread":   json.dumps(conv.to_dict(), ensure_ascii=False) if conv else None,
+                    }
+                    get_store().add_response(record)
+                    st.session_state.step = 7
+                    st.rerun()
+        with col2:
+            # Returns right away: a cache hit is in the thread already, a miss streams in below.
+            st.button("SEND", key="send_btn", on_click=send_query)
+        st.checkbox("Fresh answer (skip cache)", key="chat_skip_cache")
+        if conv:
+            st.button("NEW CHAT", key="new_chat", help="Start a new conversation with this profile",
+                      on_click=new_chat, args=(sel["id"],))
+        stats = get_answer_cache().stats()
+        tier = st.session_state.get("last_tier") if own_last else None
+        served = f" · last answer: {tier} tier" if tier and conv else ""
+        st.caption(f"Answer cache: {stats['hits']} hits · {stats['misses']} misses · {stats['size']} stored{served}")
+
+# ---------------------------------------------------------------------------
+#  STEP LOGIC
+# ---------------------------------------------------------------------------
+with get_metrics().timer("step_render_seconds", step=step):
+    if step == 0:
+        st.markdown(logo_html(160), unsafe_allow_html=True)
+        st.markdown(SPACER_HTML, unsafe_allow_html=True)
+        row1c1, row1c2 = st.columns(2)
+        with row1c1:
+            if st.button("SAVED PROFILES", key="home_profiles"):
+                if profiles:
+                    st.session_state.step = 8
+                    st.rerun()
+                else:
+                    st.warning("No profiles yet.")
+        with row1c2:
+            if st.button("NEW PROFILE", key="home_create"):
+                st.session_state.step = 1
+                st.rerun()
+        st.markdown(SPACER_HTML, unsafe_allow_html=True)
+        row2c1, row2c2 = st.columns(2)
+        with row2c1:
+            if st.button("CHAT", key="home_chat"):
+                st.session_state.step = 6 if profiles else 1
+                if not profiles:
+                    st.warning("No profiles – create one first.")
+                st.rerun()
+        with row2c2:
+            if st.button("SAVED CHATS", key="home_saved"):
+                if saved_count:
+                    st.session_state.step = 7
+                    st.rerun()
+                else:
+                    st.warning("No saved responses yet!")
+
+    elif step == 1:
+        render_top_nav() 
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        st.markdown('<div class="biglabel">Select A Parenting Source Type</div>', unsafe_allow_html=True)
+        st.markdown('<div class="frame-avatar"></div>', unsafe_allow_html=True)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("📚  Book", key="btn_book"):
+                st.session_state.source_type = "Book"
+                st.session_state.step = 2
+                st.rerun()
+        with col2:
+            if st.button("🧑‍  Expert", key="btn_expert"):
+                st.session_state.source_type = "Expert"
+                st.session_state.step = 2
+                st.rerun()
+        with col3:
+            if st.button("🌟  Style", key="btn_style"):
+                st.session_state.source_type = "Style"
+                st.session_state.step = 2
+                st.rerun()
+
+    elif step == 2:
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        st.markdown(f'<div class="biglabel">Choose a {st.session_state.source_type}</div>', unsafe_allow_html=True)
+        options = BOOKS if st.session_state.source_type == "Book" else EXPERTS if st.session_state.source_type == "Expert" else STYLES
+        emoji = "📚" if st.session_state.source_type == "Book" else "🧑‍" if st.session_state.source_type == "Expert" else "🌟"
+        st.markdown(f'<div class="frame-avatar">{emoji}</div>', unsafe_allow_html=True)
+        choice = st.selectbox("Select or enter your own:", options + ["Other..."])
+        custom = st.text_input("Enter custom name") if choice == "Other..." else ""
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("BACK", key="btn_back_step2"):
+                st.session_state.step = 1
+                st.rerun()
+        with col2:
+            if st.button("CREATE", key="btn_create_step2"):
+                src_name = custom if choice == "Other..." else choice
+                if not src_name:
+                    st.warning("Please provide a name.")
+                else:
+                    st.session_state.source_name = src_name
+                    start_persona_request()
+                    st.session_state.step = 3
+                    st.rerun()
+
+    elif step == 3:
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        st.markdown('<div class="biglabel">GENERATING YOUR PARENTING AGENT PERSONA</div>', unsafe_allow_html=True)
+        st.markdown('<div class="frame-avatar">🧠✨</div>', unsafe_allow_html=True)
+        # After a failure only RETRY starts a new request; auto-starting would loop with the poller.
+        if not any(k in st.session_state for k in ("persona_description", "persona_job", "persona_error")):
+            start_persona_request()
+        job = get_jobs().get(st.session_state.get("persona_job"))
+        if job:
+            render_job_progress(job.id)
+            if st.button("CANCEL", key="btn_cancel_persona"):
+                get_jobs().cancel(st.session_state.pop("persona_job"))
+                st.session_state.step = 2
+                st.rerun()
+        if "persona_error" in st.session_state:
+            st.error(f"OpenAI API error: {st.session_state.persona_error}  \nPress RETRY to try again.")
+        desc = st.session_state.get("persona_description")
+        if desc:
+            st.info(desc)
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("RETRY", key="btn_retry"):
+                start_persona_request(bypass_cache=True)
+                st.rerun()
+        with col2:
+            if st.button("SAVE", key="btn_save_persona"):
+                st.session_state.step = 4
+                st.rerun()
+
+    elif step == 4:
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        st.markdown('<div class="biglabel">PARENTING AGENT DETAILS</div>', unsafe_allow_html=True)
+        st.markdown('<div class="frame-avatar">📷</div>', unsafe_allow_html=True)
+        with st.form("profile"):
+            p_name = st.text_input("Parent first name")
+            c_age  = st.number_input("Child age", 1, 21)
+            c_name = st.text_input("Child first name")
+            prof_nm= st.text_input("Profile name")
+            saved  = st.form_submit_button("SAVE")
+        if saved:
+            if not all([p_name, c_age, c_name, prof_nm]):
+                st.warning("Please fill every field.")
+            else:
+                from persona_models import PersonaProfile  # pydantic loads on the first save, not at startup
+                profile = PersonaProfile(
+                    profile_name=prof_nm,
+                    parent_name=p_name,
+                    child_name=c_name,
+                    child_age=int(c_age),
+                    source_type=st.session_state.source_type,
+                    source_name=st.session_state.source_name,
+                    persona_description=st.session_state.persona_description
                 )
-                st.session_state.last_answer = json.loads(out.choices[0].message.content)["answer"]
-            except Exception as e:
-                st.error(f"OpenAI API error: {e}")
+                get_store().add_profile(profile.model_dump())
+                st.success("Profile saved!")
+                st.session_state.step = 5
+                st.rerun()
+        if st.button("BACK", key="btn_back_details"):
+            st.session_state.step = 3
             st.rerun()
+    elif step == 5:
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        render_top_nav() 
+        st.markdown('<div class="biglabel">PARENTING AGENT PROFILE CREATED! 🎉</div>', unsafe_allow_html=True)
+        st.markdown('<div class="frame-avatar">📝🎉</div>', unsafe_allow_html=True)
 
-elif step == 7:
-    st.markdown(
-                """
-                <div style="text-align:center;">
-                  <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
-                </div>
-                """,
-                unsafe_allow_html=True,)
-    render_top_nav() 
-    st.markdown('<div class="biglabel">SELECT A SAVED CHAT</div>', unsafe_allow_html=True)
-    if not st.session_state.saved_responses:
-        st.info("No saved responses."); st.session_state.step = 0; st.rerun()
-    titles = [f"{i+1}. {r['profile']} – {r['shortcut']}" for i, r in enumerate(st.session_state.saved_responses)]
-    sel_idx = st.selectbox("Saved Chats:", range(len(titles)), format_func=lambda i: titles[i], key="saved_select")
-    item = st.session_state.saved_responses[sel_idx]
-    for field in ("profile","shortcut"):
-        st.markdown(f'''
-          <p style="color:#fff;margin:4px 0;">
-            <strong>{field.title()}:</strong> {item[field]}
-          </p>''', unsafe_allow_html=True)
-    st.markdown('''
-      <p style="color:#fff;margin:4px 0;"><strong>Question:</strong></p>''',
-      unsafe_allow_html=True)
-    st.markdown(f'''
-      <blockquote style="color:#fff;border-left:4px solid #27e67a;
-                        padding-left:8px;margin:4px 0;">
-        {item["question"]}
-      </blockquote>''', unsafe_allow_html=True)
-    st.markdown('''
-      <p style="color:#fff;margin:4px 0;"><strong>Answer:</strong></p>''',
-      unsafe_allow_html=True)
-    st.markdown(f'''
-      <div class="answer-box" style="color:#fff;">
-        {item["answer"]}
-      </div>''', unsafe_allow_html=True)
-    c1, c2 = st.columns(2)
-    with c1:
-        if st.button("DELETE", key="btn_delete_saved"):
-            st.session_state.saved_responses.pop(sel_idx)
-            save_json(RESPONSES_FILE, st.session_state.saved_responses)
-            st.rerun()
-    with c2:
-        if st.button("CLOSE", key="btn_close_saved"):
-            st.session_state.step = 0
-            st.rerun()
+    elif step == 6:
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        render_top_nav() 
+        st.markdown('<div class="biglabel">1. SELECT A PARENTING AGENT</div>', unsafe_allow_html=True)
+        render_profile_card()
+        st.markdown('<div class="biglabel">2. SELECT A RESPONSE TYPE</div>', unsafe_allow_html=True)
+        render_shortcut_picker()
+        st.markdown('<div class="biglabel">3. WHAT DO YOU WANT TO ASK?</div>', unsafe_allow_html=True)
+        render_query_area()
 
-elif step == 8:
-    st.markdown(
-                """
-                <div style="text-align:center;">
-                  <img src="https://img1.wsimg.com/isteam/ip/e13cd0a5-b867-446e-af2a-268488bd6f38/myparenthelpers%20logo%20round.png" width="80" />
-                </div>
-                """,
-                unsafe_allow_html=True,)
-    render_top_nav() 
-    st.markdown('<div class="biglabel">MY PROFILES</div>', unsafe_allow_html=True)
-    if not st.session_state.profiles:
-        st.info("No profiles stored."); st.session_state.step = 0; st.rerun()
-    titles = [f"{i+1}. {p['profile_name']}" for i,p in enumerate(st.session_state.profiles)]
-    idx = st.selectbox("Select a profile to view / edit", range(len(titles)), format_func=lambda i: titles[i], key="profile_select")
-    prof = st.session_state.profiles[idx]
-    with st.form("edit_profile"):
-        p_name = st.text_input("Parent first name", value=prof["parent_name"])
-        c_age  = st.number_input("Child age", 1, 21, value=prof["child_age"])
-        c_name = st.text_input("Child first name", value=prof["child_name"])
-        prof_nm= st.text_input("Profile name", value=prof["profile_name"])
-        desc   = st.text_area("Persona description", value=prof["persona_description"], height=150)
-        saved  = st.form_submit_button("SAVE CHANGES")
-    if saved:
-        prof.update(parent_name=p_name, child_age=int(c_age), child_name=c_name, profile_name=prof_nm, persona_description=desc)
-        st.session_state.profiles[idx] = prof
-        save_json(PROFILES_FILE, st.session_state.profiles)
-        st.success("Profile updated!")
-    c1, c2 = st.columns(2)
-    with c1:
-        if st.button("DELETE PROFILE", key="btn_delete_profile"):
-            st.session_state.profiles.pop(idx)
-            save_json(PROFILES_FILE, st.session_state.profiles)
-            st.rerun()
-    with c2:
-        if st.button("CLOSE", key="btn_close_profile"):
-            st.session_state.step = 0
-            st.rerun()
+    elif step == 7:
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        render_top_nav() 
+        st.markdown('<div class="biglabel">SELECT A SAVED CHAT</div>', unsafe_allow_html=True)
+        if not saved_count:
+            st.info("No saved responses."); st.session_state.step = 0; st.rerun()
+        q_col, p_col, s_col = st.columns([2,1,1])
+        query = q_col.text_input("Search", key="saved_query", placeholder="Words from the question or answer")
+        prof_filter = p_col.selectbox("Profile", ["All", *get_read_model().profile_names()], key="saved_profile")
+        sc_filter = s_col.selectbox("Shortcut", ["All", *SHORTCUTS], key="saved_shortcut")
+        page = current_page("saved", (query, prof_filter, sc_filter))
+        search = lambda page: get_store().search_responses(
+            query, profile=None if prof_filter == "All" else prof_filter,
+            shortcut=None if sc_filter == "All" else sc_filter, limit=PAGE_SIZE, offset=page * PAGE_SIZE)
+        total, rows = search(page)
+        if not rows and page:  # the page emptied out, e.g. after a delete
+            page = st.session_state.saved_page = (total - 1) // PAGE_SIZE if total else 0
+            total, rows = search(page)
+        if not rows:
+            st.info("No saved chats match your search.")
+        else:
+            titles = {r["id"]: f"{page*PAGE_SIZE+i+1}. {r['profile']} – {r['shortcut']} – {r['preview']}" for i, r in enumerate(rows)}
+            sel_id = st.selectbox("Saved Chats:", list(titles), format_func=lambda i: titles[i], key="saved_select")
+            render_pager("saved", page, total)
+            item = get_store().get_response(sel_id)  # only the selected body is loaded
+            if item is None:  # deleted by another session since the page was read
+                st.rerun()
+            for field in ("profile","shortcut"):
+                st.markdown(f'''
+                  <p style="color:#fff;margin:4px 0;">
+                    <strong>{field.title()}:</strong> {item[field]}
+                  </p>''', unsafe_allow_html=True)
+            if item["thread"]:  # a multi-turn chat: show the whole conversation
+                render_thread(Conversation.from_dict(json.loads(item["thread"])), st.container())
+            else:
+                st.markdown('''
+                  <p style="color:#fff;margin:4px 0;"><strong>Question:</strong></p>''',
+                  unsafe_allow_html=True)
+                st.markdown(f'''
+                  <blockquote style="color:#fff;border-left:4px solid #27e67a;
+                                    padding-left:8px;margin:4px 0;">
+                    {item["question"]}
+                  </blockquote>''', unsafe_allow_html=True)
+                st.markdown('''
+                  <p style="color:#fff;margin:4px 0;"><strong>Answer:</strong></p>''',
+                  unsafe_allow_html=True)
+                st.markdown(f'''
+                  <div class="answer-box" style="color:#fff;">
+                    {item["answer"]}
+                  </div>''', unsafe_allow_html=True)
+        c1, c2 = st.columns(2)
+        with c1:
+            if rows and st.button("DELETE", key="btn_delete_saved"):
+                get_store().delete_response(sel_id)
+                st.rerun()
+        with c2:
+            if st.button("CLOSE", key="btn_close_saved"):
+                st.session_state.step = 0
+                st.rerun()
+        render_export("responses")
+
+    elif step == 8:
+        st.markdown(logo_html(80), unsafe_allow_html=True)
+        render_top_nav() 
+        st.markdown('<div class="biglabel">MY PROFILES</div>', unsafe_allow_html=True)
+        if not profiles:
+            st.info("No profiles stored."); st.session_state.step = 0; st.rerun()
+        name_q = st.text_input("Find a profile", key="profile_query").strip().lower()
+        matches = [p for p in profiles if name_q in p["profile_name"].lower()] if name_q else profiles
+        page = min(current_page("profile", name_q), max(0, (len(matches) - 1) // PAGE_SIZE))
+        rows = matches[page*PAGE_SIZE:(page+1)*PAGE_SIZE]
+        if not rows:
+            st.info("No profiles match your search.")
+        else:
+            titles = {p["id"]: f"{page*PAGE_SIZE+i+1}. {p['profile_name']}" for i,p in enumerate(rows)}
+            prof_id = st.selectbox("Select a profile to view / edit", list(titles), format_func=lambda i: titles[i], key="profile_select")
+            render_pager("profile", page, len(matches))
+            prof = dict(get_read_model().profile(prof_id))  # copy: the shared snapshot is read-only
+            with st.form("edit_profile"):
+                p_name = st.text_input("Parent first name", value=prof["parent_name"])
+                c_age  = st.number_input("Child age", 1, 21, value=prof["child_age"])
+                c_name = st.text_input("Child first name", value=prof["child_name"])
+                prof_nm= st.text_input("Profile name", value=prof["profile_name"])
+                desc   = st.text_area("Persona description", value=prof["persona_description"], height=150)
+                saved  = st.form_submit_button("SAVE CHANGES")
+            if saved:
+                prof.update(parent_name=p_name, child_age=int(c_age), child_name=c_name, profile_name=prof_nm, persona_description=desc)
+                get_store().update_profile(prof_id, prof)
+                st.success("Profile updated!")
+        c1, c2 = st.columns(2)
+        with c1:
+            if rows and st.button("DELETE PROFILE", key="btn_delete_profile"):
+                get_store().delete_profile(prof_id)
+                st.rerun()
+        with c2:
+            if st.button("CLOSE", key="btn_close_profile"):
+                st.session_state.step = 0
+                st.rerun()
+        render_export("profiles")
+
+# ---------------------------------------------------------------------------
+#  ADMIN: METRICS PANEL  (open the app with ?admin=<admin_token>)
+# ---------------------------------------------------------------------------
+admin_token = st.secrets.get("admin_token")
+if admin_token and st.query_params.get("admin") == admin_token:
+    with st.expander("📊 Metrics"):
+        st.dataframe(get_metrics().summary(), hide_index=True)
+        st.dataframe(get_metrics().counters(), hide_index=True)
+        st.download_button("Prometheus export", get_metrics().prometheus(), file_name="mph_metrics.prom")
+        legacy = st.secrets.get("legacy_user") or get_shards().legacy_key()
+        st.caption(f"{get_shards().count()} user shards · data from before sharding: ?u={legacy}")
@@ -0,0 +1,46 @@
+import json
+from typing import Optional
+
+from pydantic import BaseModel, field_validator
+
+# ---------------------------------------------------------------------------
+#  MODELS
+# ---------------------------------------------------------------------------
+# Kept out of personas.py so pydantic is imported only when a persona or
+# profile is validated, not on every cold start.
+class PersonaSource(BaseModel):
+    source_type: str
+    source_name: str
+    persona_description: str
+
+    @field_validator("persona_description")
+    @classmethod
+    def _not_blank(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("persona_description is empty")
+        return value
+
+class PersonaProfile(PersonaSource):
+    profile_name: str
+    parent_name: str
+    child_name: str
+    child_age: int
+
+
+class SavedResponse(BaseModel):
+    profile: str
+    shortcut: str
+    question: str
+    answer: str
+    thread: Optional[str] = None
+
+    @field_validator("thread", mode="before")
+    @classmethod
+    def _thread_json(cls, value):
+        if value in (None, ""):
+            return None
+        if not isinstance(value, str):  # NDJSON may carry the conversation as an object
+            value = json.dumps(value, ensure_ascii=False)
+        if not isinstance(json.loads(value), dict):
+            raise ValueError("thread must be a JSON object")
+        return value
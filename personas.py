@@ -0,0 +1,52 @@
+import json
+
+# ---------------------------------------------------------------------------
+#  PERSONA CATALOG
+# ---------------------------------------------------------------------------
+BOOKS = [
+    "Parenting with Presence", "Parenting Without Power Struggles",
+    "Peaceful Parent, Happy Kids", "Permission to Parent",
+    "Positive Parenting: An Essential Guide", "Punished by Rewards"
+]
+EXPERTS = [
+    "Dr. Laura Markham", "Dr. Daniel Siegel", "Dr. Ross Greene",
+    "Janet Lansbury", "Adele Faber"
+]
+STYLES = [
+    "Positive Parenting", "Authoritative", "Permissive",
+    "Attachment Parenting", "Montessori", "Gentle Parenting"
+]
+CATALOG = {"Book": BOOKS, "Expert": EXPERTS, "Style": STYLES}
+
+PERSONA_CACHE_FILE = "parent_helpers_personas.json"
+PERSONA_PROMPT_VERSION = 1          # bump whenever persona_prompt() changes
+PERSONA_CACHE_SIZE = 512
+PERSONA_CACHE_TTL = 30 * 24 * 3600  # seconds
+
+# ---------------------------------------------------------------------------
+#  STEP 3 PROMPT
+# ---------------------------------------------------------------------------
+def persona_prompt(source_type: str, source_name: str) -> str:
+    return (
+        f"Summarize the parenting philosophy, core principles, and practices of "
+        f"the {source_type} '{source_name}' in under 200 words. "
+        "Respond in a JSON object with 'persona_description'."
+    )
+
+def parse_persona(source_type: str, source_name: str, raw: str) -> str:
+    """Validate a step 3 completion with the PersonaProfile field rules and return the description."""
+    from persona_models import PersonaSource  # pydantic loads on the first generated persona
+    desc = json.loads(raw)["persona_description"]
+    return PersonaSource(source_type=source_type, source_name=source_name, persona_description=desc).persona_description
+
+def fetch_persona(llm, source_type: str, source_name: str) -> str:
+    """Generate one persona through a routing.Router, which picks the model tier."""
+    messages = [{"role": "user", "content": persona_prompt(source_type, source_name)}]
+    route = llm.route("persona", messages, catalog=source_name in CATALOG.get(source_type, ()))
+    out = llm.chat(
+        call="persona",
+        route=route,
+        messages=messages,
+        response_format={"type": "json_object"},
+    )
+    return parse_persona(source_type, source_name, out.choices[0].message.content)
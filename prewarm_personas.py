@@ -0,0 +1,80 @@
+"""Pre-generate personas for every BOOKS/EXPERTS/STYLES entry.
+
+Writes into the same versioned persona cache file the app loads at startup, so
+built-in sources never wait on generation in step 3. Entries already in the
+file are skipped, which makes an interrupted run resumable. Run it while the
+app is stopped (or restart the app afterwards) so the two do not overwrite
+each other's cache file. Entries expire with the app's persona cache TTL
+(30 days), so re-run it at least that often.
+
+    python prewarm_personas.py                  # uses OPENAI_API_KEY
+    python prewarm_personas.py --workers 8
+    python prewarm_personas.py --dry-run        # list what would be generated
+    python prewarm_personas.py --stub           # offline run with canned personas
+
+Models are picked by the app's routing rules (model_routing.json, or --routing).
+"""
+import argparse, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache import LRUCache, persona_key
+from llm import LLMClient, StubLLM
+from personas import (
+    CATALOG, PERSONA_CACHE_FILE, PERSONA_CACHE_SIZE, PERSONA_CACHE_TTL,
+    PERSONA_PROMPT_VERSION, fetch_persona,
+)
+from routing import ROUTING_FILE, Router, load_routing
+
+STUB_CACHE_FILE = "parent_helpers_personas.stub.json"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache-file", help=f"default {PERSONA_CACHE_FILE} ({STUB_CACHE_FILE} with --stub)")
+    parser.add_argument("--routing", default=ROUTING_FILE, help="model routing config (default model_routing.json)")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests (default 4)")
+    parser.add_argument("--force", action="store_true", help="regenerate entries that are already cached")
+    parser.add_argument("--dry-run", action="store_true", help="list pending entries and exit")
+    parser.add_argument("--stub", action="store_true", help="use the offline stub backend")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="seconds per stub call")
+    args = parser.parse_args(argv)
+    args.cache_file = args.cache_file or (STUB_CACHE_FILE if args.stub else PERSONA_CACHE_FILE)
+
+    cache = LRUCache(maxsize=PERSONA_CACHE_SIZE, ttl=PERSONA_CACHE_TTL, path=args.cache_file)
+    entries = [(t, n) for t, names in CATALOG.items() for n in names]
+    pending = [(t, n) for t, n in entries
+               if args.force or persona_key(t, n, PERSONA_PROMPT_VERSION) not in cache]
+    print(f"{len(entries)} catalog entries, {len(entries) - len(pending)} cached, {len(pending)} to generate")
+    if args.dry_run or not pending:
+        for t, n in pending:
+            print(f"  {t}: {n}")
+        return 0
+
+    if args.stub:
+        llm = StubLLM(latency=args.stub_latency)
+    else:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            print("OPENAI_API_KEY is not set (use --stub for an offline run)", file=sys.stderr)
+            return 2
+        llm = LLMClient(api_key=api_key, max_concurrency=args.workers)
+    router = Router(llm, load_routing(args.routing))
+
+    started, failed = time.perf_counter(), 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(fetch_persona, router, t, n): (t, n) for t, n in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            t, n = futures[future]
+            try:
+                # Saved after every entry so an interrupted run resumes where it stopped.
+                cache.put(persona_key(t, n, PERSONA_PROMPT_VERSION), future.result())
+                print(f"[{done}/{len(pending)}] {t}: {n}")
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(pending)}] {t}: {n} FAILED: {e}", file=sys.stderr)
+    print(f"done in {time.perf_counter() - started:.1f}s, {failed} failed -> {args.cache_file}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import hashlib
+
+# ---------------------------------------------------------------------------
+#  CHAT PROMPT BUILDER
+# ---------------------------------------------------------------------------
+# Layout, most stable first, so provider-side prompt caching can reuse the
+# longest possible prefix from one SEND to the next:
+#
+#   1. system  persona + profile facts      byte-identical for a given profile
+#   2. system  summary of earlier turns     changes only when memory compacts
+#   3. ...     kept conversation turns      grows turn by turn
+#   4. system  shortcut instruction         may change on every turn
+#   5. user    the question
+#
+# Anything that varies per request (instruction, question) stays after the
+# history, never inside the prefix.
+SHORTCUT_INSTRUCTIONS = {
+    "🤝 CONNECT": "Help explain with examples.",
+    "🌱 GROW": "Offer advanced strategies.",
+    "🔍 EXPLORE": "Facilitate age-appropriate Q&A.",
+    "🛠 RESOLVE": "Provide step-by-step resolution.",
+    "❤ SUPPORT": "Offer empathetic support.",
+}
+JSON_ANSWER_INSTRUCTION = "Respond as JSON with 'answer'."
+
+
+def system_prefix(profile: dict) -> str:
+    """The persona system message; depends on nothing but the stored profile."""
+    return (
+        f"You are a parenting coach with persona: {profile['persona_description'].strip()}\n"
+        f"Parent: {profile['parent_name'].strip()}\n"
+        f"Child: {profile['child_name'].strip()}\n"
+        f"Age: {int(profile['child_age'])}"
+    )
+
+
+def prefix_key(profile: dict) -> str:
+    """Short id of the system prefix, sent as ``prompt_cache_key`` to keep one profile's calls together."""
+    return "mph-" + hashlib.sha256(system_prefix(profile).encode("utf-8")).hexdigest()[:16]
+
+
+def instruction(shortcut: str, json_answer: bool = False) -> str:
+    parts = [SHORTCUT_INSTRUCTIONS.get(shortcut, "")]
+    if json_answer:
+        parts.append(JSON_ANSWER_INSTRUCTION)
+    return " ".join(p for p in parts if p)
+
+
+def build_messages(profile: dict, history: list, shortcut: str, query: str, json_answer: bool = False) -> list:
+    """Chat messages for one SEND; ``history`` comes from ``Conversation.messages()``."""
+    messages = [{"role": "system", "content": system_prefix(profile)}] + list(history)
+    extra = instruction(shortcut, json_answer)
+    if extra:
+        messages.append({"role": "system", "content": extra})
+    messages.append({"role": "user", "content": query})
+    return messages
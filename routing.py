@@ -0,0 +1,244 @@
+"""Model routing: pick a model tier per LLM call, fall back on timeout / 429.
+
+Rules live in model_routing.json (path overridable with the ``model_routing``
+secret). Dry-run them against the offline stub:
+
+    python routing.py --call chat --shortcut "🔍 EXPLORE" --prompt-tokens 300
+    python routing.py --call chat --prompt-tokens 300 --fail gpt-4o-mini=timeout
+    python routing.py --call persona --catalog --stream
+"""
+import argparse, json, os, sys, threading, time
+from collections import deque
+from functools import lru_cache
+from typing import Optional
+
+from conversation import estimate_tokens
+
+# ---------------------------------------------------------------------------
+#  ROUTING CONFIG
+# ---------------------------------------------------------------------------
+ROUTING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_routing.json")
+# Used when the config file is missing: the models the app hard-coded before routing.
+DEFAULT_ROUTING = {
+    "default_tier": "standard",
+    "tiers": {
+        "standard": {"model": "gpt-4o", "fallback": ["fast"]},
+        "fast": {"model": "gpt-4o-mini", "fallback": ["standard"]},
+    },
+    "rules": [{"call": "summary", "tier": "fast"}],
+}
+LATENCY_WINDOW = 300.0              # seconds of served calls a tier's latency is judged on
+LATENCY_MIN_SAMPLES = 5
+RULE_KEYS = {"call", "shortcut", "catalog", "min_prompt_tokens", "max_prompt_tokens", "tier", "budget_s"}
+
+
+def load_routing(path: str = ROUTING_FILE) -> dict:
+    """Read and check a routing config; ``DEFAULT_ROUTING`` when ``path`` does not exist."""
+    if not os.path.exists(path):
+        return DEFAULT_ROUTING
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    tiers = config.get("tiers") or {}
+    if config.get("default_tier") not in tiers:
+        raise ValueError(f"{path}: default_tier must name one of {sorted(tiers)}")
+    for name, tier in tiers.items():
+        if not tier.get("model"):
+            raise ValueError(f"{path}: tier {name!r} has no model")
+        unknown = [t for t in tier.get("fallback", []) if t not in tiers]
+        if unknown:
+            raise ValueError(f"{path}: tier {name!r} falls back to unknown tiers {unknown}")
+    for n, rule in enumerate(config.get("rules", [])):
+        if rule.get("tier") not in tiers:
+            raise ValueError(f"{path}: rule {n} names unknown tier {rule.get('tier')!r}")
+        if set(rule) - RULE_KEYS:
+            raise ValueError(f"{path}: rule {n} has unknown keys {sorted(set(rule) - RULE_KEYS)}")
+    return config
+
+
+@lru_cache(maxsize=None)
+def fallback_errors() -> tuple:
+    """Errors that move a call on to the next tier (openai is imported on first use, see llm.py)."""
+    import openai
+    return (openai.APITimeoutError, openai.RateLimitError)
+
+
+def matches(rule: dict, call: str, shortcut: Optional[str], prompt_tokens: int, catalog: bool) -> bool:
+    if "call" in rule and rule["call"] != call:
+        return False
+    if "shortcut" in rule and shortcut not in rule["shortcut"]:
+        return False
+    if "catalog" in rule and rule["catalog"] != catalog:
+        return False
+    if prompt_tokens < rule.get("min_prompt_tokens", 0):
+        return False
+    return prompt_tokens <= rule.get("max_prompt_tokens", prompt_tokens)
+
+
+# ---------------------------------------------------------------------------
+#  ROUTER
+# ---------------------------------------------------------------------------
+class Route:
+    """The tiers one call will try, in order; ``served`` is set to the tier that answered."""
+
+    def __init__(self, call: str, chain: list, reason: str, budget: Optional[float] = None):
+        self.call = call
+        self.chain = chain
+        self.reason = reason
+        self.budget = budget
+        self.served: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {"call": self.call, "chain": self.chain, "reason": self.reason,
+                "budget_s": self.budget, "served": self.served}
+
+
+class Router:
+    """Duck-compatible with LLMClient: ``chat``/``stream`` pick the model themselves.
+
+    The first matching rule names the tier (``default_tier`` if none does);
+    the tier's ``fallback`` list is tried next when it times out or is rate
+    limited. With a latency budget (per rule, or per call in ``budgets_s``),
+    tiers whose recent p90 is over budget move behind ones that are within it.
+    Latency means time to first chunk for streams, the whole call otherwise.
+    Calls that pass ``model=`` explicitly are not routed.
+    """
+
+    def __init__(self, llm, config: Optional[dict] = None, metrics=None):
+        self.llm = llm
+        self.config = config or DEFAULT_ROUTING
+        self.tiers = self.config["tiers"]
+        self.metrics = metrics
+        self._latency: dict = {}        # tier -> deque of (finished_at, seconds)
+        self._lock = threading.Lock()
+
+    def p90(self, tier: str) -> Optional[float]:
+        """Recent p90 latency of a tier; None until it has enough served calls."""
+        cutoff = time.time() - LATENCY_WINDOW
+        with self._lock:
+            recent = sorted(s for t, s in self._latency.get(tier, ()) if t >= cutoff)
+        if len(recent) < LATENCY_MIN_SAMPLES:
+            return None
+        return recent[min(len(recent) - 1, int(0.9 * len(recent)))]
+
+    def _record_latency(self, tier: str, seconds: float):
+        with self._lock:
+            self._latency.setdefault(tier, deque(maxlen=256)).append((time.time(), seconds))
+
+    def route(self, call: str, messages: Optional[list] = None, shortcut: Optional[str] = None,
+              catalog: bool = False, prompt_tokens: Optional[int] = None) -> Route:
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages or ())
+        tier, reason, budget = self.config["default_tier"], "default", None
+        for n, rule in enumerate(self.config.get("rules", [])):
+            if matches(rule, call, shortcut, prompt_tokens, catalog):
+                tier, reason, budget = rule["tier"], f"rule {n}", rule.get("budget_s")
+                break
+        if budget is None:
+            budget = self.config.get("budgets_s", {}).get(call)
+        chain = [tier] + [t for t in self.tiers[tier].get("fallback", []) if t != tier]
+        if budget is not None:
+            over = [t for t in chain if (self.p90(t) or 0.0) > budget]
+            if over and chain[0] in over and len(over) < len(chain):
+                chain = [t for t in chain if t not in over] + over
+                reason += f", {tier} over {budget}s budget"
+        return Route(call, chain, reason, budget)
+
+    def _attempts(self, route: Route, kwargs: dict):
+        """(tier, is_last, kwargs for the client) per tier; only the last tier keeps the client's retries."""
+        for n, tier in enumerate(route.chain):
+            spec = self.tiers[tier]
+            extra = {"model": spec["model"]}
+            if spec.get("timeout"):
+                extra["timeout"] = spec["timeout"]
+            if n < len(route.chain) - 1:
+                extra["max_retries"] = 0
+            yield tier, n == len(route.chain) - 1, {**kwargs, **extra}
+
+    def _count(self, route: Route, tier: str, outcome: str):
+        if self.metrics is not None:
+            self.metrics.inc("llm_route_total", call=route.call, tier=tier, outcome=outcome)
+
+    def chat(self, call: str = "chat", route: Optional[Route] = None, **kwargs):
+        if "model" in kwargs:
+            return self.llm.chat(call=call, **kwargs)
+        route = route or self.route(call, kwargs.get("messages"))
+        for tier, last, attempt in self._attempts(route, kwargs):
+            started = time.perf_counter()
+            try:
+                out = self.llm.chat(call=call, **attempt)
+            except fallback_errors():
+                if last:
+                    raise
+                self._count(route, tier, "fallback")
+                continue
+            self._record_latency(tier, time.perf_counter() - started)
+            self._count(route, tier, "served")
+            route.served = tier
+            return out
+
+    def stream(self, call: str = "chat", route: Optional[Route] = None, **kwargs):
+        """Like ``LLMClient.stream``; falls back only until the first chunk has arrived."""
+        if "model" in kwargs:
+            yield from self.llm.stream(call=call, **kwargs)
+            return
+        route = route or self.route(call, kwargs.get("messages"))
+        for tier, last, attempt in self._attempts(route, kwargs):
+            started = time.perf_counter()
+            chunks = self.llm.stream(call=call, **attempt)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                first = None
+            except fallback_errors():
+                chunks.close()
+                if last:
+                    raise
+                self._count(route, tier, "fallback")
+                continue
+            self._record_latency(tier, time.perf_counter() - started)
+            self._count(route, tier, "served")
+            route.served = tier
+            if first is not None:
+                yield first
+                yield from chunks
+            return
+
+
+# ---------------------------------------------------------------------------
+#  DRY RUN
+# ---------------------------------------------------------------------------
+def main(argv=None) -> int:
+    from llm import StubLLM
+    from metrics import Metrics
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=ROUTING_FILE)
+    parser.add_argument("--call", default="chat", choices=["chat", "persona", "summary"])
+    parser.add_argument("--shortcut")
+    parser.add_argument("--catalog", action="store_true", help="persona source is a built-in catalog entry")
+    parser.add_argument("--prompt-tokens", type=int, default=200)
+    parser.add_argument("--fail", action="append", default=[], metavar="MODEL=timeout|rate_limit",
+                        help="make the stub fail every call to MODEL")
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args(argv)
+
+    fail_models = dict(f.split("=", 1) if "=" in f else (f, "timeout") for f in args.fail)
+    llm = StubLLM(fail_models=fail_models)
+    metrics = Metrics()
+    router = Router(llm, load_routing(args.config), metrics)
+    messages = [{"role": "user", "content": "x" * (4 * args.prompt_tokens)}]
+    route = router.route(args.call, messages, shortcut=args.shortcut, catalog=args.catalog)
+    try:
+        if args.stream:
+            "".join(c.choices[0].delta.content for c in router.stream(call=args.call, route=route, messages=messages))
+        else:
+            router.chat(call=args.call, route=route, messages=messages)
+        error = None
+    except fallback_errors() as e:
+        error = str(e)
+    print(json.dumps({**route.to_dict(), "models_tried": llm.models, "error": error}, ensure_ascii=False))
+    return 0 if error is None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Cold-start check: import time and first render of the app against a budget.
+
+Each run starts a fresh interpreter (like a new container after a scale-up),
+imports Streamlit and the app's own top-level imports, then renders the home
+screen once through AppTest. It also checks that modules only needed by the
+LLM / validation code paths (openai, pydantic) were not loaded by that first
+render. Prints one JSON report; exits 1 when a budget is exceeded.
+
+    python startup_check.py                                  # default budgets
+    python startup_check.py --import-budget-ms 1200 --render-budget-ms 600 --runs 5
+    python startup_check.py --app /path/to/old/mph2025_v5.py --no-fail   # measure only
+"""
+import argparse, ast, json, os, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(ROOT, "mph2025_v5.py")
+IMPORT_BUDGET_MS = 1000             # streamlit + the app's module imports
+RENDER_BUDGET_MS = 300              # first script run of the home screen
+DEFERRED_MODULES = ("openai", "pydantic")
+
+
+def app_imports(app: str) -> list:
+    """The app's top-level import statements, as source lines."""
+    with open(app, "r", encoding="utf-8") as f:
+        source = f.read()
+    return [ast.get_source_segment(source, node) for node in ast.parse(source).body
+            if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure(app: str) -> dict:
+    """One cold start; runs in the child interpreter."""
+    sys.path[0] = os.path.dirname(os.path.abspath(app))  # the app's modules, not this checkout's
+    started = time.perf_counter()
+    import streamlit  # noqa: F401  (part of every cold start)
+    streamlit_ms = 1000 * (time.perf_counter() - started)
+    imports = "\n".join(app_imports(app))
+    started = time.perf_counter()
+    exec(imports, {})
+    imports_ms = 1000 * (time.perf_counter() - started)
+
+    from streamlit.testing.v1 import AppTest
+    # AppTest scans installed packages for components on every first run; time
+    # that on an empty script and leave it out of the app's first render.
+    empty = AppTest.from_string("import streamlit as st")
+    started = time.perf_counter()
+    empty.run()
+    harness_ms = 1000 * (time.perf_counter() - started)
+    at = AppTest.from_file(app, default_timeout=60)
+    at.secrets["openai_key"] = "sk-startup-check"  # never used: the home screen makes no LLM call
+    started = time.perf_counter()
+    at.run()
+    render_ms = max(0.0, 1000 * (time.perf_counter() - started) - harness_ms)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    started = time.perf_counter()
+    at.run()
+    rerun_ms = 1000 * (time.perf_counter() - started)
+    return {"streamlit_import_ms": streamlit_ms, "app_import_ms": imports_ms,
+            "first_render_ms": render_ms, "rerun_ms": rerun_ms,
+            "loaded_at_first_render": [m for m in DEFERRED_MODULES if m in sys.modules]}
+
+
+def cold_start(app: str) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:  # empty store, like a fresh container
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--app", app],
+            cwd=data_dir, capture_output=True, text=True,
+        )
+    if out.returncode:
+        raise RuntimeError(f"cold start failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=APP)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to take the median of")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--render-budget-ms", type=float, default=RENDER_BUDGET_MS)
+    parser.add_argument("--no-fail", action="store_true", help="report only, always exit 0")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.app)))
+        return 0
+
+    runs = [cold_start(args.app) for _ in range(args.runs)]
+    median = lambda k: round(statistics.median(r[k] for r in runs), 1)
+    report = {k: median(k) for k in ("streamlit_import_ms", "app_import_ms", "first_render_ms", "rerun_ms")}
+    report["import_ms"] = round(report["streamlit_import_ms"] + report["app_import_ms"], 1)
+    report["loaded_at_first_render"] = sorted({m for r in runs for m in r["loaded_at_first_render"]})
+    failures = []
+    if report["import_ms"] > args.import_budget_ms:
+        failures.append(f"import {report['import_ms']}ms > {args.import_budget_ms}ms")
+    if report["first_render_ms"] > args.render_budget_ms:
+        failures.append(f"first render {report['first_render_ms']}ms > {args.render_budget_ms}ms")
+    if report["loaded_at_first_render"]:
+        failures.append(f"loaded before first use: {', '.join(report['loaded_at_first_render'])}")
+    report.update(runs=args.runs, app=args.app, failures=failures, ok=not failures)
+    print(json.dumps(report))
+    return 0 if args.no_fail or not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,512 @@
+import functools, hashlib, json, os, re, secrets, sqlite3, threading, time
+from collections import OrderedDict
+
+# ---------------------------------------------------------------------------
+#  SQLITE STORE FOR PROFILES & SAVED RESPONSES
+# ---------------------------------------------------------------------------
+PROFILE_FIELDS = ("profile_name", "parent_name", "child_name", "child_age",
+                  "source_type", "source_name", "persona_description")
+RESPONSE_FIELDS = ("profile", "shortcut", "question", "answer")
+RESPONSE_COLUMNS = RESPONSE_FIELDS + ("thread",)   # thread: JSON of the whole conversation, or NULL
+TABLE_COLUMNS = {"profiles": PROFILE_FIELDS, "responses": RESPONSE_COLUMNS}
+PREVIEW_CHARS = 80
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles(
+    id                  INTEGER PRIMARY KEY,
+    profile_name        TEXT NOT NULL,
+    parent_name         TEXT NOT NULL,
+    child_name          TEXT NOT NULL,
+    child_age           INTEGER NOT NULL,
+    source_type         TEXT NOT NULL,
+    source_name         TEXT NOT NULL,
+    persona_description TEXT NOT NULL,
+    content_hash        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_name ON profiles(profile_name);
+CREATE INDEX IF NOT EXISTS idx_profiles_hash ON profiles(content_hash);
+
+CREATE TABLE IF NOT EXISTS responses(
+    id           INTEGER PRIMARY KEY,
+    profile      TEXT NOT NULL,
+    shortcut     TEXT NOT NULL,
+    question     TEXT NOT NULL,
+    answer       TEXT NOT NULL,
+    content_hash TEXT NOT NULL UNIQUE,
+    thread       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_responses_profile ON responses(profile);
+CREATE INDEX IF NOT EXISTS idx_responses_shortcut ON responses(shortcut);
+
+-- Full-text index over saved questions/answers, kept in sync by the triggers below.
+CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5(
+    question, answer, content='responses', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS responses_fts_insert AFTER INSERT ON responses BEGIN
+    INSERT INTO responses_fts(rowid, question, answer) VALUES(new.id, new.question, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS responses_fts_delete AFTER DELETE ON responses BEGIN
+    INSERT INTO responses_fts(responses_fts, rowid, question, answer)
+    VALUES('delete', old.id, old.question, old.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS responses_fts_update AFTER UPDATE ON responses BEGIN
+    INSERT INTO responses_fts(responses_fts, rowid, question, answer)
+    VALUES('delete', old.id, old.question, old.answer);
+    INSERT INTO responses_fts(rowid, question, answer) VALUES(new.id, new.question, new.answer);
+END;
+
+CREATE TABLE IF NOT EXISTS meta(
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def content_hash(record: dict, fields) -> str:
+    payload = json.dumps([record.get(f) for f in fields], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def response_hash(record: dict) -> str:
+    return content_hash(record, RESPONSE_COLUMNS)
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text.lower()))
+
+
+def timed(method):
+    """Report the duration of a Store method as ``storage_seconds{op=<name>}``."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        with self.metrics.timer("storage_seconds", op=method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Store:
+    """One shared connection per process; SQLite's WAL mode handles other processes."""
+
+    def __init__(self, path: str, metrics=None):
+        self.path = path
+        self.metrics = metrics
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # -- meta ----------------------------------------------------------------
+    def get_meta(self, key: str, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return default if row is None else row["value"]
+
+    def _set_meta(self, key: str, value):
+        self._db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES(?, ?)", (key, str(value)))
+
+    def _bump(self, table: str):
+        self._db.execute(
+            "INSERT INTO meta(key, value) VALUES(?, '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+            (f"{table}_version",),
+        )
+
+    @timed
+    def version(self, table: str) -> int:
+        """Write counter for ``table``; changes whenever any process writes to it."""
+        return int(self.get_meta(f"{table}_version", 0))
+
+    # -- profiles ------------------------------------------------------------
+    @timed
+    def list_profiles(self) -> list:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, {', '.join(PROFILE_FIELDS)} FROM profiles ORDER BY id"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    @timed
+    def add_profile(self, profile: dict) -> int:
+        values = [profile[f] for f in PROFILE_FIELDS]
+        with self._lock, self._db:
+            cur = self._db.execute(
+                f"INSERT INTO profiles({', '.join(PROFILE_FIELDS)}, content_hash) "
+                f"VALUES({', '.join('?' * len(PROFILE_FIELDS))}, ?)",
+                values + [content_hash(profile, PROFILE_FIELDS)],
+            )
+            self._bump("profiles")
+        return cur.lastrowid
+
+    @timed
+    def update_profile(self, profile_id: int, profile: dict):
+        assignments = ", ".join(f"{f}=?" for f in PROFILE_FIELDS)
+        values = [profile[f] for f in PROFILE_FIELDS]
+        with self._lock, self._db:
+            self._db.execute(
+                f"UPDATE profiles SET {assignments}, content_hash=? WHERE id=?",
+                values + [content_hash(profile, PROFILE_FIELDS), profile_id],
+            )
+            self._bump("profiles")
+
+    @timed
+    def delete_profile(self, profile_id: int):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM profiles WHERE id=?", (profile_id,))
+            self._bump("profiles")
+
+    # -- saved responses -----------------------------------------------------
+    @timed
+    def list_responses(self) -> list:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, {', '.join(RESPONSE_COLUMNS)} FROM responses ORDER BY id"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    @timed
+    def count_responses(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @timed
+    def search_responses(self, query: str = "", profile=None, shortcut=None, limit: int = 20, offset: int = 0):
+        """One page of saved responses matching ``query`` and the optional filters.
+
+        Returns ``(total, rows)``. Rows carry a short question preview instead
+        of the bodies; full-text matches are ordered by relevance, everything
+        else newest first.
+        """
+        match = fts_query(query)
+        source, where, params = "responses r", [], []
+        if match:
+            source = "responses_fts JOIN responses r ON r.id = responses_fts.rowid"
+            where.append("responses_fts MATCH ?")
+            params.append(match)
+        if profile:
+            where.append("r.profile = ?")
+            params.append(profile)
+        if shortcut:
+            where.append("r.shortcut = ?")
+            params.append(shortcut)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        order = "responses_fts.rank, r.id DESC" if match else "r.id DESC"
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM {source}{clause}", params).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT r.id, r.profile, r.shortcut, substr(r.question, 1, {PREVIEW_CHARS}) AS preview "
+                f"FROM {source}{clause} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return total, [dict(r) for r in rows]
+
+    @timed
+    def get_response(self, response_id: int):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT id, {', '.join(RESPONSE_COLUMNS)} FROM responses WHERE id=?", (response_id,)
+            ).fetchone()
+        return None if row is None else dict(row)
+
+    @timed
+    def add_response(self, record: dict):
+        """Insert a saved response; returns its new id, or None if it was already saved.
+
+        ``record["thread"]`` (optional) is the whole conversation as JSON.
+        """
+        with self._lock, self._db:
+            cur = self._db.execute(
+                f"INSERT OR IGNORE INTO responses({', '.join(RESPONSE_COLUMNS)}, content_hash) "
+                f"VALUES({', '.join('?' * len(RESPONSE_COLUMNS))}, ?)",
+                [record.get(f) for f in RESPONSE_COLUMNS] + [response_hash(record)],
+            )
+            if cur.rowcount:
+                self._bump("responses")
+        return cur.lastrowid if cur.rowcount else None
+
+    @timed
+    def delete_response(self, response_id: int):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses WHERE id=?", (response_id,))
+            self._bump("responses")
+
+    # -- bulk export / import (see transfer.py) ------------------------------
+    def iter_rows(self, table: str, batch_size: int = 1000):
+        """Yield every row of ``table`` in id order, reading ``batch_size`` rows at a time.
+
+        Keyset paging: the lock is held for one batch only and memory stays
+        flat however large the table is.
+        """
+        columns = ", ".join(TABLE_COLUMNS[table])
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT id, {columns} FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_id = rows[-1]["id"]
+
+    @timed
+    def import_profiles(self, profiles: list) -> int:
+        """Insert one chunk of profiles in one transaction, skipping any already stored
+        (same content hash, also within the chunk); returns how many were new."""
+        rows = []
+        for p in profiles:
+            digest = content_hash(p, PROFILE_FIELDS)
+            rows.append([p[f] for f in PROFILE_FIELDS] + [digest, digest])
+        with self._lock, self._db:
+            cur = self._db.executemany(
+                f"INSERT INTO profiles({', '.join(PROFILE_FIELDS)}, content_hash) "
+                f"SELECT {', '.join('?' * len(PROFILE_FIELDS))}, ? "
+                f"WHERE NOT EXISTS (SELECT 1 FROM profiles WHERE content_hash = ?)",
+                rows,
+            )
+            if cur.rowcount:
+                self._bump("profiles")
+        return cur.rowcount
+
+    @timed
+    def import_responses(self, responses: list) -> int:
+        """Insert one chunk of saved responses in one transaction; duplicates are skipped
+        by the unique content hash. Returns how many were new."""
+        with self._lock, self._db:
+            cur = self._db.executemany(
+                f"INSERT OR IGNORE INTO responses({', '.join(RESPONSE_COLUMNS)}, content_hash) "
+                f"VALUES({', '.join('?' * len(RESPONSE_COLUMNS))}, ?)",
+                [[r.get(f) for f in RESPONSE_COLUMNS] + [response_hash(r)] for r in responses],
+            )
+            if cur.rowcount:
+                self._bump("responses")
+        return cur.rowcount
+
+    # -- one-time migration from the JSON files ------------------------------
+    def needs_json_migration(self) -> bool:
+        return self.get_meta("json_migrated") is None
+
+    @timed
+    def migrate_json(self, profiles: list, responses: list):
+        with self._lock, self._db:
+            self._db.execute("BEGIN IMMEDIATE")  # one process migrates, the others then see the flag
+            if self.get_meta("json_migrated") is not None:
+                return
+            self._db.executemany(
+                f"INSERT INTO profiles({', '.join(PROFILE_FIELDS)}, content_hash) "
+                f"VALUES({', '.join('?' * len(PROFILE_FIELDS))}, ?)",
+                [[p.get(f) for f in PROFILE_FIELDS] + [content_hash(p, PROFILE_FIELDS)] for p in profiles],
+            )
+            self._db.executemany(
+                f"INSERT OR IGNORE INTO responses({', '.join(RESPONSE_COLUMNS)}, content_hash) "
+                f"VALUES({', '.join('?' * len(RESPONSE_COLUMNS))}, ?)",
+                [[r.get(f) for f in RESPONSE_COLUMNS] + [response_hash(r)] for r in responses],
+            )
+            self._set_meta("json_migrated", len(profiles) + len(responses))
+            self._bump("profiles")
+            self._bump("responses")
+
+
+# ---------------------------------------------------------------------------
+#  SHARED READ MODEL
+# ---------------------------------------------------------------------------
+class ReadModel:
+    """Process-wide, read-only snapshot of the store shared by every session.
+
+    Each table is re-read only when its write counter changes, so a cold session
+    costs one counter lookup instead of a full parse. Callers must treat the
+    returned dicts as immutable and copy them before editing.
+    """
+
+    def __init__(self, store: Store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._snapshots = {}
+        self._derived = {}
+
+    def _snapshot(self, table: str, loader):
+        version = self.store.version(table)
+        if self._versions.get(table) != version:
+            with self._lock:
+                if self._versions.get(table) != version:
+                    self._snapshots[table] = tuple(loader())
+                    self._versions[table] = version
+        return self._snapshots[table]
+
+    def profiles(self) -> tuple:
+        return self._snapshot("profiles", self.store.list_profiles)
+
+    def profile_names(self) -> tuple:
+        """Sorted distinct profile names (filter options), recomputed only with a new snapshot."""
+        profiles = self.profiles()
+        source, names = self._derived.get("profile_names", (None, ()))
+        if source is not profiles:
+            names = tuple(sorted({p["profile_name"] for p in profiles}))
+            self._derived["profile_names"] = (profiles, names)
+        return names
+
+    def profile(self, profile_id: int):
+        return next((p for p in self.profiles() if p["id"] == profile_id), None)
+
+    def response_count(self) -> int:
+        """Number of saved responses; the list itself is paged through ``Store.search_responses``."""
+        return self._snapshot("responses", lambda: (self.store.count_responses(),))[0]
+
+
+# ---------------------------------------------------------------------------
+#  PER-USER SHARDS
+# ---------------------------------------------------------------------------
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards(
+    key_hash  TEXT PRIMARY KEY,
+    file      TEXT NOT NULL,
+    created   REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta(
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def key_hash(user_key: str) -> str:
+    """What the manifest and the shard file names know of a user key."""
+    return hashlib.sha256(user_key.encode("utf-8")).hexdigest()
+
+
+class EmptyReadModel:
+    """Read model of a user who has no shard yet: reads are empty and touch no file."""
+
+    def profiles(self) -> tuple:
+        return ()
+
+    def profile_names(self) -> tuple:
+        return ()
+
+    def profile(self, profile_id: int):
+        return None
+
+    def response_count(self) -> int:
+        return 0
+
+
+EMPTY_READ_MODEL = EmptyReadModel()
+
+
+class Shards:
+    """One SQLite file per user key under ``root``, plus a small manifest index.
+
+    A user's Store/ReadModel is opened on first use and kept in an LRU of at
+    most ``max_open`` shards; a request therefore only touches its own user's
+    data, and writes of different users never share a database lock. The
+    shard file is created by ``store()`` (the first write); until then
+    ``read_model()`` is an ``EmptyReadModel``, so a visit that only looks
+    around leaves nothing on disk.
+    """
+
+    def __init__(self, root: str, metrics=None, max_open: int = 256):
+        self.root = root
+        self.metrics = metrics
+        self.max_open = max_open
+        os.makedirs(root, exist_ok=True)
+        self._manifest = sqlite3.connect(os.path.join(root, "manifest.db"), check_same_thread=False, timeout=30)
+        self._manifest.execute("PRAGMA journal_mode=WAL")
+        self._manifest.executescript(MANIFEST_SCHEMA)
+        self._open: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+    def path(self, user_key: str) -> str:
+        # Shard files and manifest rows only carry the key's hash, never the key itself.
+        return os.path.join(self.root, key_hash(user_key)[:32] + ".db")
+
+    def exists(self, user_key: str) -> bool:
+        with self._lock:
+            return user_key in self._open or os.path.exists(self.path(user_key))
+
+    def _open_shard(self, user_key: str):
+        with self._lock:
+            shard = self._open.get(user_key)
+            if shard is not None:
+                self._open.move_to_end(user_key)
+                return shard
+            path = self.path(user_key)
+            store = Store(path, metrics=self.metrics)
+            now = time.time()
+            with self._manifest:
+                self._manifest.execute(
+                    "INSERT INTO shards(key_hash, file, created, last_seen) VALUES(?, ?, ?, ?) "
+                    "ON CONFLICT(key_hash) DO UPDATE SET last_seen = excluded.last_seen",
+                    (key_hash(user_key), os.path.basename(path), now, now),
+                )
+            shard = self._open[user_key] = (store, ReadModel(store))
+            # Evicted shards are not closed: a background job may still hold the Store.
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+            return shard
+
+    def store(self, user_key: str) -> Store:
+        """The user's Store, creating the shard if it does not exist yet; use it to write."""
+        return self._open_shard(user_key)[0]
+
+    def read_model(self, user_key: str):
+        if not self.exists(user_key):
+            return EMPTY_READ_MODEL
+        return self._open_shard(user_key)[1]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._manifest.execute("SELECT COUNT(*) FROM shards").fetchone()[0]
+
+    # -- migration from the single global store -------------------------------
+    def _meta(self, key: str):
+        with self._lock:
+            row = self._manifest.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _generated(self, key: str, value: str) -> str:
+        """``meta[key]``, set to ``value`` the first time it is asked for."""
+        with self._lock, self._manifest:
+            self._manifest.execute("INSERT OR IGNORE INTO meta(key, value) VALUES(?, ?)", (key, value))
+        return self._meta(key)
+
+    def legacy_key(self) -> str:
+        """User key that owns the pre-sharding data; generated once, stored in the manifest.
+
+        This is the only key the manifest keeps in clear (the admin panel shows
+        it); set the ``legacy_user`` secret instead to keep it off disk.
+        """
+        return self._generated("legacy_user", secrets.token_urlsafe(12))
+
+    def account_secret(self) -> str:
+        """Server-side HMAC key for signed-in users' keys when no ``user_key_secret`` is configured."""
+        return self._generated("account_secret", secrets.token_hex(32))
+
+    def needs_legacy_migration(self) -> bool:
+        return self._meta("legacy_migrated") is None
+
+    def migrate_legacy(self, user_key: str, db_path: str, profiles: list, responses: list):
+        """Copy the old global store into ``user_key``'s shard, once.
+
+        ``db_path`` (the global SQLite file) wins when it exists; otherwise the
+        legacy JSON ``profiles``/``responses`` are imported. The old files are left
+        in place as a backup.
+        """
+        if os.path.exists(db_path):
+            legacy = Store(db_path)
+            profiles, responses = legacy.list_profiles(), legacy.list_responses()
+            legacy.close()
+        if profiles or responses:  # a fresh install has nothing to move and gets no shard
+            self.store(user_key).migrate_json(profiles, responses)
+        with self._lock, self._manifest:
+            self._manifest.execute("INSERT OR REPLACE INTO meta(key, value) VALUES('legacy_migrated', ?)",
+                                   (key_hash(user_key),))
@@ -0,0 +1,4 @@
+import os, sys
+
+# The app's modules live flat in the repository root (see bench/).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,70 @@
+import threading, time
+
+import pytest
+
+from cache import SingleFlight
+from llm import StubLLM
+
+MESSAGES = [{"role": "user", "content": "How do I handle bedtime?"}]
+
+
+def run_concurrently(n: int, fn) -> list:
+    """Start ``fn()`` on ``n`` threads at once; returns each thread's result or exception."""
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return results
+
+
+def test_identical_concurrent_calls_make_one_upstream_call():
+    llm, flight = StubLLM(latency=0.3), SingleFlight()
+    call = lambda: llm.chat(messages=MESSAGES, model="gpt-4o-mini")
+    results = run_concurrently(8, lambda: flight.do("same-key", call))
+    assert llm.calls == 1
+    assert all(r is results[0] for r in results)  # followers get the leader's object
+    assert flight.stats() == {"leaders": 1, "followers": 7, "in_flight": 0}
+    assert flight.waiters("same-key") == 0
+
+
+def test_followers_get_the_leaders_exception():
+    llm, flight = StubLLM(fail_models={"gpt-4o": "timeout"}), SingleFlight()
+
+    def call():
+        time.sleep(0.3)  # the stub fails at once; give the other threads time to join
+        return llm.chat(messages=MESSAGES, model="gpt-4o")
+
+    results = run_concurrently(6, lambda: flight.do("same-key", call))
+    assert llm.calls == 1
+    assert all(isinstance(r, Exception) for r in results)
+    assert all(r is results[0] for r in results)
+    assert not flight.in_flight("same-key")
+
+
+def test_different_keys_do_not_coalesce():
+    llm, flight = StubLLM(latency=0.1), SingleFlight()
+    run_concurrently(4, lambda: flight.do(threading.get_ident(), llm.chat, messages=MESSAGES))
+    assert llm.calls == 4
+
+
+def test_a_new_call_after_the_flight_runs_again():
+    def fail():
+        raise ValueError("boom")
+
+    flight = SingleFlight()
+    assert flight.do("k", lambda: 1) == 1
+    assert flight.do("k", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        flight.do("k", fail)
+    assert flight.do("k", lambda: 3) == 3
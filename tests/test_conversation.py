@@ -0,0 +1,80 @@
+from conversation import Conversation, estimate_tokens, llm_summarizer
+from llm import StubLLM
+
+
+def chat(n: int, words: int = 60, **kwargs) -> Conversation:
+    conv = Conversation(**kwargs)
+    for i in range(n):
+        conv.add("user", f"question {i} " + "bedtime " * words)
+        conv.add("assistant", f"answer {i} " + "routine " * words)
+    return conv
+
+
+def test_short_thread_is_left_alone():
+    conv = chat(2)
+    calls = []
+    conv.compact(lambda summary, turns: calls.append(turns) or "unused")
+    assert not calls
+    assert conv.summary == "" and conv.folded == 0
+    assert conv.turns == conv.history
+
+
+def test_window_stays_within_budget_as_the_thread_grows():
+    stub = StubLLM()
+    conv = Conversation(budget=400, summary_budget=100)
+    for i in range(30):
+        conv.add("user", f"question {i} " + "bedtime " * 60)
+        conv.add("assistant", f"answer {i} " + "routine " * 60)
+        conv.compact(llm_summarizer(stub))
+        assert conv.tokens() <= conv.budget
+        assert estimate_tokens(conv.summary) <= conv.summary_budget + 1
+    assert len(conv.history) == 60             # the full thread is kept for display and saving
+    assert conv.folded + len(conv.turns) == 60
+    assert conv.turns[-1] == conv.history[-1]
+
+
+def test_each_turn_is_summarized_once_when_evicted():
+    conv, seen = chat(6, budget=300), []
+
+    def summarize(summary, turns):
+        seen.extend(t["content"] for t in turns)
+        return f"summary of {len(seen)} turns"
+
+    conv.compact(summarize)
+    conv.compact(summarize)                     # nothing new to evict: no second call
+    assert len(seen) == conv.folded == len(set(seen))
+    assert conv.summary == f"summary of {conv.folded} turns"
+    assert len(conv.turns) >= conv.keep_last
+    assert conv.messages()[0]["role"] == "system" and conv.summary in conv.messages()[0]["content"]
+
+
+def test_failing_summarizer_falls_back_to_truncation():
+    def summarize(summary, turns):
+        raise TimeoutError("upstream down")
+
+    conv = chat(6, budget=600, summary_budget=200)
+    conv.compact(summarize)
+    assert conv.folded > 0
+    # The clipped transcript of the evicted turns, capped to its newest end.
+    assert f"Coach: answer {conv.folded // 2 - 1} " in conv.summary
+    assert "question 0 " not in conv.summary
+    assert conv.tokens() <= conv.budget
+
+
+def test_latest_exchange_is_kept_even_when_it_alone_is_over_budget():
+    conv = Conversation(budget=100, keep_last=2)
+    conv.add("user", "first " * 20)
+    conv.add("assistant", "reply " * 20)
+    conv.add("user", "long " * 400)
+    conv.add("assistant", "longer " * 400)
+    conv.compact()
+    assert [t["role"] for t in conv.turns] == ["user", "assistant"]
+    assert conv.turns[0]["content"].startswith("long") and conv.turns[1]["content"].startswith("longer")
+    assert conv.tokens() <= conv.budget
+
+
+def test_round_trip_keeps_the_compacted_state():
+    conv = chat(6, budget=300)
+    conv.compact()
+    copy = Conversation.from_dict(conv.to_dict())
+    assert (copy.history, copy.turns, copy.summary, copy.folded) == (conv.history, conv.turns, conv.summary, conv.folded)
@@ -0,0 +1,72 @@
+import threading, time
+
+from cache import LRUCache, SingleFlight
+from conversation import Conversation
+from jobs import CANCELLED, DONE, JobQueue
+from llm import StubLLM
+from routing import Router
+from workers import generate_answer
+
+PROFILE = {"id": 1, "profile_name": "Bedtime", "parent_name": "Sam", "child_name": "Alex", "child_age": 4,
+           "source_type": "Book", "source_name": "Peaceful Parent, Happy Kids",
+           "persona_description": "Warm, boundaried coaching that names feelings."}
+QUERY = "How do I handle bedtime?"
+
+
+def wait(job, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished, f"job still {job.status}"
+    return job
+
+
+def send(jobs, llm, cache, inflight, conv=None):
+    """Submit one streamed SEND like the app does."""
+    return jobs.submit("chat", generate_answer, llm, cache, inflight, conv or Conversation(), PROFILE,
+                       "💬 DEFAULT", QUERY, False, True)
+
+
+def test_cancel_before_start_never_runs_the_job():
+    jobs, release, ran = JobQueue(max_workers=1), threading.Event(), []
+    blocker = jobs.submit("block", lambda job: release.wait(5))
+    queued = jobs.submit("chat", lambda job: ran.append(job))
+    assert jobs.cancel(queued.id)
+    release.set()
+    assert wait(queued).status == CANCELLED
+    assert wait(blocker).status == DONE
+    assert not ran
+    assert not jobs.cancel(queued.id)  # finished jobs cannot be cancelled again
+
+
+def test_cancelled_stream_stops_and_caches_nothing():
+    stub = StubLLM(latency=0.3)
+    llm, cache, inflight = Router(stub), LRUCache(maxsize=8), SingleFlight()
+    jobs = JobQueue(max_workers=2)
+    job = send(jobs, llm, cache, inflight)
+    time.sleep(0.1)                     # the stub is still before its first chunk
+    jobs.cancel(job.id)
+    assert wait(job).status == CANCELLED
+    assert job.result is None
+    assert cache.stats()["size"] == 0
+    assert stub.calls == 1
+
+
+def test_cancelled_leader_keeps_streaming_for_a_waiting_session():
+    stub = StubLLM(latency=0.3)
+    llm, cache, inflight = Router(stub), LRUCache(maxsize=8), SingleFlight()
+    jobs = JobQueue(max_workers=2)
+    leader = send(jobs, llm, cache, inflight)
+    time.sleep(0.05)
+    follower = send(jobs, llm, cache, inflight)
+    deadline = time.monotonic() + 5
+    while not inflight.stats()["followers"] and time.monotonic() < deadline:
+        time.sleep(0.01)                # the follower is now blocked on the leader's call
+    jobs.cancel(leader.id)
+    assert wait(follower).status == DONE
+    assert wait(leader).status == CANCELLED  # its own session still sees it as cancelled
+    assert follower.result.startswith("[stub]")
+    assert leader.result == follower.result   # the stream ran to the end for the follower
+    assert stub.calls == 1
+    assert cache.stats()["size"] == 1
+    assert inflight.stats() == {"leaders": 1, "followers": 1, "in_flight": 0}
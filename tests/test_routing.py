@@ -0,0 +1,89 @@
+import pytest
+
+from llm import StubLLM
+from routing import Route, Router, fallback_errors
+
+CONFIG = {
+    "default_tier": "standard",
+    "tiers": {
+        "fast": {"model": "mini", "fallback": ["standard"]},
+        "standard": {"model": "big", "fallback": ["fast"]},
+    },
+    "rules": [{"call": "chat", "tier": "fast"}],
+}
+MESSAGES = [{"role": "user", "content": "How do I handle bedtime?"}]
+
+
+class RecordingLLM(StubLLM):
+    """StubLLM that also records the ``max_retries`` each call was made with."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.retries = []
+
+    def chat(self, call: str = "chat", timeout=None, **kwargs):
+        self.retries.append(kwargs.get("max_retries"))
+        return super().chat(call, timeout, **kwargs)
+
+
+@pytest.mark.parametrize("kind", ["timeout", "rate_limit"])
+def test_falls_back_to_the_next_tier(kind):
+    stub = StubLLM(fail_models={"mini": kind})
+    router = Router(stub, CONFIG)
+    route = router.route("chat", MESSAGES)
+    out = router.chat(route=route, messages=MESSAGES)
+    assert out.choices[0].message.content.startswith("[stub]")
+    assert stub.models == ["mini", "big"]
+    assert route.served == "standard"
+
+
+@pytest.mark.parametrize("kind", ["timeout", "rate_limit"])
+def test_stream_falls_back_before_the_first_chunk(kind):
+    stub = StubLLM(fail_models={"mini": kind})
+    router = Router(stub, CONFIG)
+    route = router.route("chat", MESSAGES)
+    text = "".join(c.choices[0].delta.content for c in router.stream(route=route, messages=MESSAGES))
+    assert text.startswith("[stub]")
+    assert stub.models == ["mini", "big"]
+    assert route.served == "standard"
+
+
+def test_only_the_last_tier_keeps_the_client_retries():
+    stub = RecordingLLM(fail_models={"mini": "timeout", "big": "rate_limit"})
+    router = Router(stub, CONFIG)
+    with pytest.raises(fallback_errors()) as error:
+        router.chat(messages=MESSAGES)
+    assert stub.models == ["mini", "big"]
+    assert stub.retries == [0, None]    # None: the client's own max_retries apply
+    assert "big" in str(error.value)    # the last tier's error is the one raised
+
+
+def test_explicit_model_is_not_routed():
+    stub = RecordingLLM(fail_models={"mini": "timeout"})
+    with pytest.raises(fallback_errors()):
+        Router(stub, CONFIG).chat(model="mini", messages=MESSAGES)
+    assert stub.models == ["mini"]
+    assert stub.retries == [None]
+
+
+def test_tier_over_its_latency_budget_moves_behind_the_fallback():
+    stub = StubLLM(latency=0.02)
+    router = Router(stub, {**CONFIG, "budgets_s": {"chat": 0.01}})
+    for _ in range(4):
+        router.chat(messages=MESSAGES)
+    assert router.route("chat", MESSAGES).chain == ["fast", "standard"]  # too few samples to judge yet
+    router.chat(messages=MESSAGES)
+    route = router.route("chat", MESSAGES)
+    assert route.chain == ["standard", "fast"]
+    assert "over 0.01s budget" in route.reason
+    router.chat(route=route, messages=MESSAGES)
+    assert stub.models[-1] == "big"
+
+
+def test_chain_is_kept_when_every_tier_is_over_budget():
+    stub = StubLLM(latency=0.02)
+    router = Router(stub, {**CONFIG, "budgets_s": {"chat": 0.01}})
+    for tier in ("fast", "standard"):
+        for _ in range(5):
+            router.chat(route=Route("chat", [tier], "pinned"), messages=MESSAGES)
+    assert router.route("chat", MESSAGES).chain == ["fast", "standard"]
@@ -0,0 +1,205 @@
+"""Streaming export / import of profiles and saved chats as NDJSON or CSV.
+
+Rows are written one at a time and read, validated and committed one chunk at
+a time, so memory stays flat whatever the size of the data. Import skips
+records already stored (same content hash) and commits every chunk on its
+own, so an interrupted import can simply be run again.
+
+    python transfer.py export profiles --user KEY -o profiles.ndjson
+    python transfer.py export responses --user KEY --format csv > chats.csv
+    python transfer.py import profiles profiles.ndjson --user KEY
+    python transfer.py import responses chats.csv --db parent_helpers.db --batch 5000
+"""
+import argparse, csv, io, json, os, sys, tempfile
+from functools import lru_cache
+from typing import Iterable, Iterator, Optional
+
+from storage import TABLE_COLUMNS, Shards, Store
+
+# ---------------------------------------------------------------------------
+#  FORMATS
+# ---------------------------------------------------------------------------
+FORMATS = ("ndjson", "csv")
+MIME = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+IMPORT_BATCH = 1000                 # records validated and committed together
+MAX_ERRORS = 20                     # invalid records reported by line number
+USERS_DIR = "parent_helpers_users"  # same default as the app
+csv.field_size_limit(64 * 1024 * 1024)  # saved threads can be far longer than csv's 128 KB default
+
+
+def guess_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+# ---------------------------------------------------------------------------
+#  EXPORT
+# ---------------------------------------------------------------------------
+def export_lines(store: Store, table: str, fmt: str = "ndjson") -> Iterator[str]:
+    """The rows of ``table`` as NDJSON or CSV text, one line (one record) at a time."""
+    fields = TABLE_COLUMNS[table]
+    rows = store.iter_rows(table)
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps({f: row[f] for f in fields}, ensure_ascii=False) + "\n"
+        return
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(["" if row[f] is None else row[f] for f in fields])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():  # header only: the table is empty
+        yield buf.getvalue()
+
+
+def export_file(store: Store, table: str, fmt: str = "ndjson"):
+    """Spool an export to an anonymous temporary file and return it rewound (for st.download_button)."""
+    f = tempfile.TemporaryFile("w+b")
+    for line in export_lines(store, table, fmt):
+        f.write(line.encode("utf-8"))
+    f.seek(0)
+    return f
+
+
+# ---------------------------------------------------------------------------
+#  IMPORT
+# ---------------------------------------------------------------------------
+def read_records(lines: Iterable[str], fmt: str = "ndjson") -> Iterator[tuple]:
+    """``(line_no, record)`` per input record; ``record`` is None when the line cannot be parsed."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_no, record if isinstance(record, dict) else None
+
+
+@lru_cache(maxsize=None)
+def _validator(table: str):
+    from pydantic import TypeAdapter  # imported on first import run, like persona_models
+    from persona_models import PersonaProfile, SavedResponse
+    return TypeAdapter(list[PersonaProfile if table == "profiles" else SavedResponse])
+
+
+def validate_chunk(table: str, chunk: list) -> tuple:
+    """Validate ``[(line_no, record), ...]`` in one pass; returns ``(valid records, [(line_no, error)])``."""
+    from pydantic import ValidationError
+    adapter = _validator(table)
+    try:
+        return [m.model_dump() for m in adapter.validate_python([r for _, r in chunk])], []
+    except ValidationError as e:
+        bad = {}
+        for err in e.errors():
+            index = err["loc"][0]
+            bad.setdefault(index, f"{'.'.join(str(x) for x in err['loc'][1:])}: {err['msg']}")
+    good = [r for i, (_, r) in enumerate(chunk) if i not in bad]
+    errors = [(chunk[i][0], msg) for i, msg in sorted(bad.items())]
+    return [m.model_dump() for m in adapter.validate_python(good)], errors
+
+
+def import_records(store: Store, table: str, records: Iterable[tuple], batch_size: int = IMPORT_BATCH,
+                   on_chunk=None) -> dict:
+    """Validate and insert ``read_records()`` output chunk by chunk; returns the counts.
+
+    Each chunk is its own transaction. ``on_chunk(stats)`` is called after every commit.
+    """
+    insert = store.import_profiles if table == "profiles" else store.import_responses
+    stats = {"table": table, "read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+
+    def note_error(line_no: int, message: str):
+        stats["invalid"] += 1
+        if len(stats["errors"]) < MAX_ERRORS:
+            stats["errors"].append(f"line {line_no}: {message}")
+
+    def flush(chunk: list):
+        valid, errors = validate_chunk(table, chunk)
+        for line_no, message in errors:
+            note_error(line_no, message)
+        added = insert(valid) if valid else 0
+        stats["imported"] += added
+        stats["duplicates"] += len(valid) - added
+        if on_chunk is not None:
+            on_chunk(stats)
+
+    chunk = []
+    for line_no, record in records:
+        stats["read"] += 1
+        if record is None:
+            note_error(line_no, "not a JSON object")
+            continue
+        chunk.append((line_no, record))
+        if len(chunk) >= batch_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return stats
+
+
+# ---------------------------------------------------------------------------
+#  CLI
+# ---------------------------------------------------------------------------
+def open_store(args) -> Store:
+    if args.db:
+        return Store(args.db)
+    if not args.user:
+        raise SystemExit("pass --user KEY (a shard under --users-dir) or --db PATH")
+    return Shards(args.users_dir).store(args.user)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("export", "import"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("table", choices=sorted(TABLE_COLUMNS))
+        if name == "import":
+            cmd.add_argument("path", help="NDJSON or CSV file, - for stdin")
+            cmd.add_argument("--batch", type=int, default=IMPORT_BATCH, help="records per validated, committed chunk")
+        else:
+            cmd.add_argument("-o", "--out", help="output file (default stdout)")
+        cmd.add_argument("--format", choices=FORMATS, help="default: from the file extension, else ndjson")
+        cmd.add_argument("--user", help="user key (the ?u= value) whose shard to use")
+        cmd.add_argument("--users-dir", default=USERS_DIR)
+        cmd.add_argument("--db", help="a single SQLite store instead of a user shard")
+    args = parser.parse_args(argv)
+    store = open_store(args)
+
+    if args.command == "export":
+        fmt = args.format or (guess_format(args.out) if args.out else "ndjson")
+        out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+        try:
+            for line in export_lines(store, args.table, fmt):
+                out.write(line)
+        except BrokenPipeError:  # e.g. piped into head
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        finally:
+            if args.out:
+                out.close()
+        return 0
+
+    fmt = args.format or guess_format(args.path)
+    src = sys.stdin if args.path == "-" else open(args.path, "r", encoding="utf-8", newline="")
+    progress = lambda s: print(f"\r{s['read']} read · {s['imported']} imported · {s['duplicates']} duplicates · "
+                               f"{s['invalid']} invalid", end="", file=sys.stderr, flush=True)
+    try:
+        stats = import_records(store, args.table, read_records(src, fmt), args.batch, on_chunk=progress)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    print(file=sys.stderr)
+    print(json.dumps(stats, ensure_ascii=False))
+    return 1 if stats["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import json
+
+from cache import answer_key
+from conversation import llm_summarizer
+from jobs import DONE, JobCancelled
+from personas import CATALOG, parse_persona, persona_prompt
+from prompts import build_messages, instruction, prefix_key, system_prefix
+
+# ---------------------------------------------------------------------------
+#  LLM JOB FUNCTIONS
+# ---------------------------------------------------------------------------
+# Submitted to the app's JobQueue and run on a worker thread: no Streamlit
+# calls. Progress goes to ``job.phase`` / ``job.partial``; the app's
+# collect_persona_job() / collect_chat_job() hand results to the session.
+def stream_text(stream):
+    """Yield the text deltas of a streamed chat completion."""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def answer_cache_key(history: list, profile: dict, shortcut: str, query: str) -> str:
+    return answer_key(system_prefix(profile), instruction(shortcut),
+                      json.dumps(history, ensure_ascii=False), " ".join(query.split()))
+
+
+def cached_answer(cache, conv, profile: dict, shortcut: str, query: str):
+    """The answer cache lookup of a SEND, cheap enough to run in the session: a hit needs no job.
+
+    Only for a thread within its budget; compacting it first can need an LLM call.
+    """
+    return cache.get(answer_cache_key(conv.messages(), profile, shortcut, query))
+
+
+def generate_persona(job, llm, cache, inflight, source_type: str, source_name: str, cache_key: str) -> str:
+    def fetch():
+        job.phase = "Synthesizing Information…"
+        messages = [{"role": "user", "content": persona_prompt(source_type, source_name)}]
+        route = llm.route("persona", messages, catalog=source_name in CATALOG.get(source_type, ()))
+        out = llm.chat(call="persona", route=route, messages=messages, response_format={"type": "json_object"})
+        job.meta["tier"] = route.served
+        job.phase = "Assessing Results…"
+        desc = parse_persona(source_type, source_name, out.choices[0].message.content)
+        job.phase = "Generating Persona…"
+        cache.put(cache_key, desc)
+        return desc
+    job.phase = "Assimilating Knowledge…"
+    return inflight.do(("persona", cache_key), fetch)
+
+
+def generate_answer(job, llm, cache, inflight, conv, profile: dict, shortcut: str, query: str,
+                    skip_cache: bool, stream: bool) -> str:
+    """One SEND. Cancelling stops the stream, unless another session waits on the same call."""
+    job.phase = "Thinking…"
+    conv.compact(llm_summarizer(llm, model=None))
+    history = conv.messages()
+    cache_key = answer_cache_key(history, profile, shortcut, query)
+    cached = None if skip_cache else cache.get(cache_key)
+    if cached is not None:
+        return cached
+    flight = ("chat", cache_key)
+    def fetch():
+        messages = build_messages(profile, history, shortcut, query, json_answer=not stream)
+        route = llm.route("chat", messages, shortcut=shortcut)
+        if stream:
+            chunks = llm.stream(
+              route=route,
+              messages=messages,
+              extra_body={"prompt_cache_key": prefix_key(profile)}
+            )
+            answer = ""
+            try:
+                for delta in stream_text(chunks):
+                    answer += delta
+                    job.partial = answer
+                    if job.cancelled() and not inflight.waiters(flight):
+                        raise JobCancelled()
+            finally:
+                chunks.close()  # frees the upstream slot right away on cancel
+        else:
+            out = llm.chat(
+              route=route,
+              messages=messages,
+              response_format={"type":"json_object"},
+              extra_body={"prompt_cache_key": prefix_key(profile)}
+            )
+            answer = json.loads(out.choices[0].message.content)["answer"]
+        job.meta["tier"] = route.served
+        cache.put(cache_key, answer)
+        return answer
+    # Sessions sending the same prompt at the same time share one upstream call.
+    if inflight.in_flight(flight):
+        job.phase = "Waiting for an identical request already in progress…"
+    return inflight.do(flight, fetch)
+
+
+def save_when_done(job, store, conv, record: dict):
+    """Job callback for SAVE WHEN READY: stores the answer even if the session has moved on."""
+    if job.status != DONE:
+        return
+    turns = [{"role": "user", "content": record["question"]}, {"role": "assistant", "content": job.result}]
+    thread = conv.to_dict()
+    thread["history"] = thread["history"] + turns
+    thread["turns"] = thread["turns"] + turns
+    store.add_response({**record, "answer": job.result, "thread": json.dumps(thread, ensure_ascii=False)})